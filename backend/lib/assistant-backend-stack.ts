@@ -168,6 +168,14 @@ export class AssistantBackendStack extends cdk.Stack {
           name: "SessionId",
           type: dynamodb.AttributeType.STRING,
         },
+        // Each conversation turn is stored as a separate item, turn 0
+        // holds the running summary of the older turns of the session.
+        sortKey: {
+          name: "Turn",
+          type: dynamodb.AttributeType.NUMBER,
+        },
+        // Expire the chat history of inactive sessions.
+        timeToLiveAttribute: "ExpiresAt",
         billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
         // Considerations when choosing a table class
         // https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/WorkingWithTables.tableclasses.html
@@ -181,6 +189,13 @@ export class AssistantBackendStack extends cdk.Stack {
 
     // -----------------------------------------------------------------------
     // Add AWS Lambda container and function to serve as the agent executor.
+    const agent_executor_environment = {
+      BEDROCK_REGION_PARAMETER: ssm_bedrock_region_parameter.parameterName,
+      LLM_MODEL_ID_PARAMETER: ssm_llm_model_id_parameter.parameterName,
+      CHAT_MESSAGE_HISTORY_TABLE: ChatMessageHistoryTable.tableName,
+      AGENT_DB_SECRET_ID: AgentDB.secret?.secretArn as string
+    };
+
     const agent_executor_lambda = new lambda.DockerImageFunction(
       this,
       "LambdaAgentContainer",
@@ -198,39 +213,68 @@ export class AssistantBackendStack extends cdk.Stack {
         timeout: cdk.Duration.minutes(5),
         memorySize: 2048,
         vpc: vpc.vpc,
-        environment: {
-          BEDROCK_REGION_PARAMETER: ssm_bedrock_region_parameter.parameterName,
-          LLM_MODEL_ID_PARAMETER: ssm_llm_model_id_parameter.parameterName,
-          CHAT_MESSAGE_HISTORY_TABLE: ChatMessageHistoryTable.tableName,
-          AGENT_DB_SECRET_ID: AgentDB.secret?.secretArn as string
-        },
+        environment: agent_executor_environment,
       }
     );
 
-    // Allow Lambda to read SSM parameters.
-    ssm_bedrock_region_parameter.grantRead(agent_executor_lambda);
-    ssm_llm_model_id_parameter.grantRead(agent_executor_lambda);
-
-    // Allow Lambda read/write access to the chat history DynamoDB table
-    // to be able to read and update it as conversations progress.
-    ChatMessageHistoryTable.grantReadWriteData(agent_executor_lambda);
-
-    // Allow Lambda to read the secret for Aurora DB connection.
-    AgentDB.secret?.grantRead(agent_executor_lambda);
-
-    // Allow network access to/from Lambda
-    // TODO: review
-    AgentDB.connections.allowDefaultPortFrom(agent_executor_lambda);
-
-    // Allow Lambda to call bedrock.
-    agent_executor_lambda.addToRolePolicy(
-      new iam.PolicyStatement({
-        actions: ["bedrock:*"],
-        resources: ["*"],
-        effect: iam.Effect.ALLOW,
-      })
+    // Add a second function from the streaming stage of the same container,
+    // it streams the response tokens as they are generated through the
+    // Lambda Web Adapter and a function URL.
+    const agent_executor_streaming_lambda = new lambda.DockerImageFunction(
+      this,
+      "LambdaAgentStreamingContainer",
+      {
+        code: lambda.DockerImageCode.fromImageAsset(
+          path.join(
+            __dirname,
+            "lambda-functions/agent-executor-lambda-container"
+          ),
+          {
+            buildArgs: { "--platform": "linux/amd64" },
+            target: "streaming"
+          }
+        ),
+        description: "Lambda function streaming the agent responses created via CDK",
+        timeout: cdk.Duration.minutes(5),
+        memorySize: 2048,
+        vpc: vpc.vpc,
+        environment: agent_executor_environment,
+      }
     );
 
+    for (const agent_lambda of [agent_executor_lambda, agent_executor_streaming_lambda]) {
+      // Allow Lambda to read SSM parameters.
+      ssm_bedrock_region_parameter.grantRead(agent_lambda);
+      ssm_llm_model_id_parameter.grantRead(agent_lambda);
+
+      // Allow Lambda read/write access to the chat history DynamoDB table
+      // to be able to read and update it as conversations progress.
+      ChatMessageHistoryTable.grantReadWriteData(agent_lambda);
+
+      // Allow Lambda to read the secret for Aurora DB connection.
+      AgentDB.secret?.grantRead(agent_lambda);
+
+      // Allow network access to/from Lambda
+      // TODO: review
+      AgentDB.connections.allowDefaultPortFrom(agent_lambda);
+
+      // Allow Lambda to call bedrock.
+      agent_lambda.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: ["bedrock:*"],
+          resources: ["*"],
+          effect: iam.Effect.ALLOW,
+        })
+      );
+    }
+
+    // The response stream of the function URL is sent as it is written,
+    // the callers sign their requests with SigV4.
+    const agent_streaming_function_url = agent_executor_streaming_lambda.addFunctionUrl({
+      authType: lambda.FunctionUrlAuthType.AWS_IAM,
+      invokeMode: lambda.InvokeMode.RESPONSE_STREAM,
+    });
+
     // Save the Lambda ARN in an SSM parameter to simplify invoking the lambda
     // from a SageMaker notebook, without having to copy it manually.
     const agentLambdaNameParameter = new ssm.StringParameter(
@@ -242,6 +286,16 @@ export class AssistantBackendStack extends cdk.Stack {
       }
     );
 
+    // Save the streaming function URL in an SSM parameter for the chat UI.
+    const agentStreamingURLParameter = new ssm.StringParameter(
+      this,
+      "AgentStreamingURLParameter",
+      {
+        parameterName: "/AgenticLLMAssistant/AgentExecutorStreamingURLParameter",
+        stringValue: agent_streaming_function_url.url,
+      }
+    );
+
     //------------------------------------------------------------------------
     // Create an S3 bucket to store the vector embeddings and SQL data
     // and allow SageMaker to read and write to it.
@@ -280,6 +334,7 @@ export class AssistantBackendStack extends cdk.Stack {
               sagemaker_db_secret_arn_parameter.parameterArn,
               subnetIdsParameter.parameterArn,
               agentLambdaNameParameter.parameterArn,
+              agentStreamingURLParameter.parameterArn,
               agentDataBucketParameter.parameterArn,
             ],
           }),
@@ -311,6 +366,13 @@ export class AssistantBackendStack extends cdk.Stack {
               agent_executor_lambda.functionArn,
             ]
           }),
+          new iam.PolicyStatement({
+            // add permission to stream the agent responses from the function URL.
+            actions: ["lambda:InvokeFunctionUrl"],
+            resources: [
+              agent_executor_streaming_lambda.functionArn,
+            ]
+          }),
         ],
       }
     );
@@ -455,5 +517,9 @@ export class AssistantBackendStack extends cdk.Stack {
       value: agent_api.url
     });
 
+    new cdk.CfnOutput(this, "StreamingFunctionURL", {
+      value: agent_streaming_function_url.url
+    });
+
   }
 }
@@ -62,4 +62,5 @@ class CustomCalculatorTool(BaseTool):
         self, query: str, run_manager: Optional[AsyncCallbackManagerForToolRun] = None
     ) -> str:
         """Use the tool asynchronously."""
-        raise NotImplementedError("Calculator does not support async")
+        # The evaluation is CPU bound and fast, there is no I/O to await.
+        return self._run(query)
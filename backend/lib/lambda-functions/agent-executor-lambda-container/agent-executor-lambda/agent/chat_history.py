@@ -0,0 +1,172 @@
+import json
+import time
+import zlib
+from typing import List, Optional
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from langchain.schema import (
+    AIMessage,
+    BaseChatMessageHistory,
+    BaseMessage,
+    messages_from_dict,
+    messages_to_dict,
+)
+
+# The turns of a session are numbered from 1, turn 0 is reserved for
+# the running summary of the session, see memory.DynamoDBSessionSummaryStore.
+SUMMARY_TURN = 0
+
+# The expiration of the items of a session is pushed back when the session is
+# active, at most once per this many seconds per item, to bound the extra
+# writes. A session expires between ttl_seconds - TTL_REFRESH_INTERVAL_SECONDS
+# and ttl_seconds after its last turn.
+TTL_REFRESH_INTERVAL_SECONDS = 24 * 3600
+
+
+def get_dynamodb_table(table_name, endpoint_url=None):
+    if endpoint_url:
+        dynamodb = boto3.resource("dynamodb", endpoint_url=endpoint_url)
+    else:
+        dynamodb = boto3.resource("dynamodb")
+    return dynamodb.Table(table_name)
+
+
+def get_expires_at(ttl_seconds):
+    """Return the epoch seconds used by the table TTL to expire an item."""
+    return int(time.time()) + ttl_seconds
+
+
+def needs_expiration_refresh(expires_at, ttl_seconds):
+    """Return whether the expiration of an item should be pushed back."""
+    return expires_at is None or int(expires_at) < (
+        get_expires_at(ttl_seconds) - TTL_REFRESH_INTERVAL_SECONDS
+    )
+
+
+def compress_messages(messages: List[BaseMessage]) -> bytes:
+    return zlib.compress(json.dumps(messages_to_dict(messages)).encode("utf-8"))
+
+
+def decompress_messages(data) -> List[BaseMessage]:
+    # boto3 returns binary attributes wrapped in a Binary object.
+    data = getattr(data, "value", data)
+    return messages_from_dict(json.loads(zlib.decompress(data).decode("utf-8")))
+
+
+class DynamoDBTurnChatMessageHistory(BaseChatMessageHistory):
+    """Chat message history stored as one DynamoDB item per conversation turn.
+
+    The items are keyed by the SessionId partition key and the Turn sort key.
+    Only the most recent max_turns turns are read with a single query, and
+    the human and AI messages of a turn are compressed and written together
+    in one put once the AI message is added. The items expire through the
+    table TTL on the ExpiresAt attribute, the expiration of the loaded turns
+    is pushed back when a turn is added so a session expires ttl_seconds after
+    its last turn and not ttl_seconds after each turn.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        session_id: str,
+        max_turns: int = 10,
+        ttl_seconds: int = 30 * 24 * 3600,
+        endpoint_url: Optional[str] = None,
+    ):
+        self.table = get_dynamodb_table(table_name, endpoint_url)
+        self.session_id = session_id
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+
+        self._messages: Optional[List[BaseMessage]] = None
+        self._items: List[dict] = []
+        self._last_turn = 0
+        self._first_turn = 1
+        self._pending_messages: List[BaseMessage] = []
+
+    def _load_recent_turns(self):
+        response = self.table.query(
+            KeyConditionExpression=(
+                Key("SessionId").eq(self.session_id) & Key("Turn").gt(SUMMARY_TURN)
+            ),
+            ScanIndexForward=False,
+            Limit=self.max_turns,
+        )
+        items = list(reversed(response["Items"]))
+
+        self._items = items
+        self._messages = []
+        for item in items:
+            self._messages.extend(decompress_messages(item["Messages"]))
+
+        if items:
+            self._first_turn = int(items[0]["Turn"])
+            self._last_turn = int(items[-1]["Turn"])
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore
+        """The messages of the most recent turns, read once per instance."""
+        if self._messages is None:
+            self._load_recent_turns()
+        return self._messages
+
+    @property
+    def first_message_index(self) -> int:
+        """The index of the first loaded message in the full session history."""
+        self.messages
+        return 2 * (self._first_turn - 1)
+
+    def add_message(self, message: BaseMessage) -> None:
+        self._pending_messages.append(message)
+        if not isinstance(message, AIMessage):
+            return
+
+        # The AI message closes the turn, write the whole turn at once.
+        self.messages
+        turn_messages, self._pending_messages = self._pending_messages, []
+        self._last_turn += 1
+        item = {
+            "SessionId": self.session_id,
+            "Turn": self._last_turn,
+            "Messages": compress_messages(turn_messages),
+            "ExpiresAt": get_expires_at(self.ttl_seconds),
+        }
+        stale_items = [
+            loaded_item
+            for loaded_item in self._items
+            if needs_expiration_refresh(loaded_item.get("ExpiresAt"), self.ttl_seconds)
+        ]
+        if stale_items:
+            # Rewrite the stale turns with the new turn in one batch request.
+            with self.table.batch_writer() as batch:
+                for stale_item in stale_items:
+                    stale_item["ExpiresAt"] = item["ExpiresAt"]
+                    batch.put_item(Item=stale_item)
+                batch.put_item(Item=item)
+        else:
+            self.table.put_item(Item=item)
+        self._items.append(item)
+        self._messages.extend(turn_messages)
+
+    def clear(self) -> None:
+        query_kwargs = {
+            "KeyConditionExpression": Key("SessionId").eq(self.session_id),
+            "ProjectionExpression": "SessionId, Turn",
+        }
+        with self.table.batch_writer() as batch:
+            while True:
+                response = self.table.query(**query_kwargs)
+                for item in response["Items"]:
+                    batch.delete_item(
+                        Key={"SessionId": item["SessionId"], "Turn": item["Turn"]}
+                    )
+                if "LastEvaluatedKey" not in response:
+                    break
+                query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        self._messages = []
+        self._items = []
+        self._first_turn = 1
+        self._last_turn = 0
+        self._pending_messages = []
@@ -1,63 +1,346 @@
 import json
 import os
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Optional
 
 import boto3
-from langchain.vectorstores import PGVector
-from langchain.sql_database import SQLDatabase
 import sqlalchemy
 
+from .db import create_pooled_engine
+
+if TYPE_CHECKING:
+    from langchain.sql_database import SQLDatabase
+
 ssm = boto3.client("ssm")
 secretsmanager_client = boto3.client("secretsmanager")
 
 # TODO: put in parameter store and read with a default factory in the dataclass
 SQL_TABLE_NAMES = ["extracted_entities"]
+# Materialized views of aggregates of the SQL tables maintained by
+# data-pipelines/scripts/load_sql_tables.py.
+SQL_SUMMARY_VIEW_NAMES = ["extracted_entities_by_company", "extracted_entities_by_year"]
+
+# Refresh the DB secret after this many seconds to pick up secret rotations
+# without requiring a cold start, the new connections of the shared engine use
+# the refreshed credentials.
+DEFAULT_DB_SECRET_TTL_SECONDS = 3600
+
+# Number of the most recent conversation turns and the approximate token budget
+# of the chat history kept verbatim in the prompt, older turns are summarized.
+DEFAULT_CHAT_HISTORY_MAX_TURNS = 5
+DEFAULT_CHAT_HISTORY_MAX_TOKENS = 1000
+# Number of turns folded into the running summary at once, the summary LLM call
+# only runs every this many turns instead of on every turn past the window.
+DEFAULT_CHAT_HISTORY_SUMMARY_BATCH_TURNS = 2
+# Expire the chat history of the sessions after 30 days of inactivity.
+DEFAULT_CHAT_HISTORY_TTL_SECONDS = 30 * 24 * 3600
+
+# Maximum number of entries of each level of the SQL QA cache.
+DEFAULT_SQL_QA_CACHE_MAX_SIZE = 256
+
+# Sizing of the connection pool shared by the vector store and the SQL tool.
+# A Lambda container serves one request at a time, the connections are used
+# by the tools running concurrently within the request.
+DEFAULT_DB_POOL_SIZE = 4
+DEFAULT_DB_MAX_OVERFLOW = 2
+DEFAULT_DB_POOL_RECYCLE_SECONDS = 300
+DEFAULT_DB_POOL_TIMEOUT_SECONDS = 10
+DEFAULT_DB_CONNECT_TIMEOUT_SECONDS = 5
+
+# Query time parameters of the approximate nearest neighbour index of the
+# embeddings, set by data-pipelines/scripts/prepare_and_load_embeddings.py.
+# Higher values trade latency for recall. The semantic search raises
+# hnsw.ef_search to the number of rows it fetches, e.g. RETRIEVAL_FETCH_K,
+# see benchmarks/vector_search_benchmark.py to tune them.
+DEFAULT_VECTOR_HNSW_EF_SEARCH = 40
+# The metadata filter of the semantic search discards the index rows of other
+# companies and years, the filtered searches scan more of the index.
+DEFAULT_VECTOR_HNSW_FILTERED_EF_SEARCH = 200
+DEFAULT_VECTOR_IVFFLAT_PROBES = 10
+
+# Retrieval strategy of the semantic search, one of similarity, mmr or
+# similarity_score_threshold, see retrieval.ConfigurableRetriever.
+DEFAULT_RETRIEVAL_STRATEGY = "mmr"
+DEFAULT_RETRIEVAL_K = 5
+DEFAULT_RETRIEVAL_FETCH_K = 50
+DEFAULT_RETRIEVAL_LAMBDA_MULT = 0.5
+DEFAULT_RETRIEVAL_SCORE_THRESHOLD = 0.5
+# Fuse a full text search with the vector search.
+DEFAULT_RETRIEVAL_HYBRID_SEARCH = True
+# Approximate token budget of the retrieved chunks stuffed in the RAG prompt,
+# and cosine similarity above which a chunk is a duplicate of a more relevant
+# one, see context_packing.ContextPacker.
+DEFAULT_RAG_CONTEXT_MAX_TOKENS = 2000
+DEFAULT_RAG_CONTEXT_DUPLICATE_SIMILARITY = 0.95
+
+# Bounds of the SQL queries generated for the SQLQA tool.
+DEFAULT_SQL_MAX_PLAN_COST = 1_000_000
+DEFAULT_SQL_STATEMENT_TIMEOUT_MS = 10_000
+DEFAULT_SQL_MAX_ROWS = 50
+DEFAULT_SQL_MAX_RESULT_BYTES = 4_000
+
+
+def get_ssm_parameters(parameter_names):
+    """Resolve several SSM parameters with a single batched API call."""
+    response = ssm.get_parameters(Names=list(parameter_names))
+    if response["InvalidParameters"]:
+        raise ValueError(
+            f"The SSM parameters {response['InvalidParameters']} could not be found."
+        )
+    return {
+        parameter["Name"]: parameter["Value"] for parameter in response["Parameters"]
+    }
 
 
 @dataclass
 class AgenticAssistantConfig:
-    bedrock_region: str = ssm.get_parameter(
-        Name=os.environ["BEDROCK_REGION_PARAMETER"]
-    )["Parameter"]["Value"]
-
-    llm_model_id: str = ssm.get_parameter(Name=os.environ["LLM_MODEL_ID_PARAMETER"])[
-        "Parameter"
-    ]["Value"]
-
-    chat_message_history_table_name: str = os.environ["CHAT_MESSAGE_HISTORY_TABLE"]
-    agent_db_secret_id: str = os.environ["AGENT_DB_SECRET_ID"]
-
-    _db_secret_string = secretsmanager_client.get_secret_value(
-        SecretId=agent_db_secret_id
-    )["SecretString"]
-    _db_secret = json.loads(_db_secret_string)
-
-    postgres_connection_string: str = PGVector.connection_string_from_db_params(
-        driver="psycopg2",
-        host=_db_secret["host"],
-        port=_db_secret["port"],
-        database=_db_secret["dbname"],
-        user=_db_secret["username"],
-        password=_db_secret["password"],
-    )
+    bedrock_region: str
+    llm_model_id: str
+    chat_message_history_table_name: str
+    agent_db_secret_id: str
 
     collection_name: str = "agentic_assistant_vector_store"
     embedding_model_id: str = "amazon.titan-embed-text-v1"
 
-    sqlalchemy_connection_url: str = sqlalchemy.URL.create(
-        "postgresql+psycopg2",
-        username=_db_secret["username"],
-        password=_db_secret["password"],
-        host=_db_secret["host"],
-        database=_db_secret["dbname"],
-    )
-
     # number of sample rows to include in the prompt from the SQL table.
     num_sql_table_sample_rows: int = 2
 
-    sql_engine = sqlalchemy.create_engine(sqlalchemy_connection_url)
-    entities_db = SQLDatabase(
-        engine=sql_engine,
-        include_tables=SQL_TABLE_NAMES,
-        sample_rows_in_table_info=num_sql_table_sample_rows,
+    db_secret_ttl_seconds: int = DEFAULT_DB_SECRET_TTL_SECONDS
+
+    chat_history_max_turns: int = DEFAULT_CHAT_HISTORY_MAX_TURNS
+    chat_history_max_tokens: int = DEFAULT_CHAT_HISTORY_MAX_TOKENS
+    chat_history_summary_batch_turns: int = DEFAULT_CHAT_HISTORY_SUMMARY_BATCH_TURNS
+    chat_history_ttl_seconds: int = DEFAULT_CHAT_HISTORY_TTL_SECONDS
+
+    sql_qa_cache_max_size: int = DEFAULT_SQL_QA_CACHE_MAX_SIZE
+
+    db_pool_size: int = DEFAULT_DB_POOL_SIZE
+    db_max_overflow: int = DEFAULT_DB_MAX_OVERFLOW
+    db_pool_recycle_seconds: int = DEFAULT_DB_POOL_RECYCLE_SECONDS
+    db_pool_timeout_seconds: int = DEFAULT_DB_POOL_TIMEOUT_SECONDS
+    db_connect_timeout_seconds: int = DEFAULT_DB_CONNECT_TIMEOUT_SECONDS
+
+    vector_hnsw_ef_search: int = DEFAULT_VECTOR_HNSW_EF_SEARCH
+    vector_hnsw_filtered_ef_search: int = DEFAULT_VECTOR_HNSW_FILTERED_EF_SEARCH
+    vector_ivfflat_probes: int = DEFAULT_VECTOR_IVFFLAT_PROBES
+
+    retrieval_strategy: str = DEFAULT_RETRIEVAL_STRATEGY
+    retrieval_k: int = DEFAULT_RETRIEVAL_K
+    retrieval_fetch_k: int = DEFAULT_RETRIEVAL_FETCH_K
+    retrieval_lambda_mult: float = DEFAULT_RETRIEVAL_LAMBDA_MULT
+    retrieval_score_threshold: float = DEFAULT_RETRIEVAL_SCORE_THRESHOLD
+    retrieval_hybrid_search: bool = DEFAULT_RETRIEVAL_HYBRID_SEARCH
+    rag_context_max_tokens: int = DEFAULT_RAG_CONTEXT_MAX_TOKENS
+    rag_context_duplicate_similarity: float = DEFAULT_RAG_CONTEXT_DUPLICATE_SIMILARITY
+
+    sql_max_plan_cost: float = DEFAULT_SQL_MAX_PLAN_COST
+    sql_statement_timeout_ms: int = DEFAULT_SQL_STATEMENT_TIMEOUT_MS
+    sql_max_rows: int = DEFAULT_SQL_MAX_ROWS
+    sql_max_result_bytes: int = DEFAULT_SQL_MAX_RESULT_BYTES
+
+    _db_secret: Optional[Dict] = field(default=None, init=False, repr=False)
+    _db_secret_fetched_at: float = field(default=0.0, init=False, repr=False)
+    _db_secret_lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+    _sql_engine: Optional[sqlalchemy.Engine] = field(
+        default=None, init=False, repr=False
     )
+    _sql_engine_lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+    _entities_db: Optional["SQLDatabase"] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def from_environment(cls):
+        bedrock_region_parameter = os.environ["BEDROCK_REGION_PARAMETER"]
+        llm_model_id_parameter = os.environ["LLM_MODEL_ID_PARAMETER"]
+
+        parameters = get_ssm_parameters(
+            [bedrock_region_parameter, llm_model_id_parameter]
+        )
+
+        return cls(
+            bedrock_region=parameters[bedrock_region_parameter],
+            llm_model_id=parameters[llm_model_id_parameter],
+            chat_message_history_table_name=os.environ["CHAT_MESSAGE_HISTORY_TABLE"],
+            agent_db_secret_id=os.environ["AGENT_DB_SECRET_ID"],
+            db_secret_ttl_seconds=int(
+                os.environ.get(
+                    "AGENT_DB_SECRET_TTL_SECONDS", DEFAULT_DB_SECRET_TTL_SECONDS
+                )
+            ),
+            chat_history_max_turns=int(
+                os.environ.get(
+                    "CHAT_HISTORY_MAX_TURNS", DEFAULT_CHAT_HISTORY_MAX_TURNS
+                )
+            ),
+            chat_history_max_tokens=int(
+                os.environ.get(
+                    "CHAT_HISTORY_MAX_TOKENS", DEFAULT_CHAT_HISTORY_MAX_TOKENS
+                )
+            ),
+            chat_history_summary_batch_turns=int(
+                os.environ.get(
+                    "CHAT_HISTORY_SUMMARY_BATCH_TURNS",
+                    DEFAULT_CHAT_HISTORY_SUMMARY_BATCH_TURNS,
+                )
+            ),
+            chat_history_ttl_seconds=int(
+                os.environ.get(
+                    "CHAT_HISTORY_TTL_SECONDS", DEFAULT_CHAT_HISTORY_TTL_SECONDS
+                )
+            ),
+            sql_qa_cache_max_size=int(
+                os.environ.get("SQL_QA_CACHE_MAX_SIZE", DEFAULT_SQL_QA_CACHE_MAX_SIZE)
+            ),
+            db_pool_size=int(os.environ.get("DB_POOL_SIZE", DEFAULT_DB_POOL_SIZE)),
+            db_max_overflow=int(
+                os.environ.get("DB_MAX_OVERFLOW", DEFAULT_DB_MAX_OVERFLOW)
+            ),
+            db_pool_recycle_seconds=int(
+                os.environ.get(
+                    "DB_POOL_RECYCLE_SECONDS", DEFAULT_DB_POOL_RECYCLE_SECONDS
+                )
+            ),
+            db_pool_timeout_seconds=int(
+                os.environ.get(
+                    "DB_POOL_TIMEOUT_SECONDS", DEFAULT_DB_POOL_TIMEOUT_SECONDS
+                )
+            ),
+            db_connect_timeout_seconds=int(
+                os.environ.get(
+                    "DB_CONNECT_TIMEOUT_SECONDS", DEFAULT_DB_CONNECT_TIMEOUT_SECONDS
+                )
+            ),
+            vector_hnsw_ef_search=int(
+                os.environ.get(
+                    "VECTOR_HNSW_EF_SEARCH", DEFAULT_VECTOR_HNSW_EF_SEARCH
+                )
+            ),
+            vector_hnsw_filtered_ef_search=int(
+                os.environ.get(
+                    "VECTOR_HNSW_FILTERED_EF_SEARCH",
+                    DEFAULT_VECTOR_HNSW_FILTERED_EF_SEARCH,
+                )
+            ),
+            vector_ivfflat_probes=int(
+                os.environ.get(
+                    "VECTOR_IVFFLAT_PROBES", DEFAULT_VECTOR_IVFFLAT_PROBES
+                )
+            ),
+            retrieval_strategy=os.environ.get(
+                "RETRIEVAL_STRATEGY", DEFAULT_RETRIEVAL_STRATEGY
+            ),
+            retrieval_k=int(os.environ.get("RETRIEVAL_K", DEFAULT_RETRIEVAL_K)),
+            retrieval_fetch_k=int(
+                os.environ.get("RETRIEVAL_FETCH_K", DEFAULT_RETRIEVAL_FETCH_K)
+            ),
+            retrieval_lambda_mult=float(
+                os.environ.get("RETRIEVAL_LAMBDA_MULT", DEFAULT_RETRIEVAL_LAMBDA_MULT)
+            ),
+            retrieval_score_threshold=float(
+                os.environ.get(
+                    "RETRIEVAL_SCORE_THRESHOLD", DEFAULT_RETRIEVAL_SCORE_THRESHOLD
+                )
+            ),
+            retrieval_hybrid_search=os.environ.get(
+                "RETRIEVAL_HYBRID_SEARCH", str(DEFAULT_RETRIEVAL_HYBRID_SEARCH)
+            ).lower()
+            == "true",
+            rag_context_max_tokens=int(
+                os.environ.get("RAG_CONTEXT_MAX_TOKENS", DEFAULT_RAG_CONTEXT_MAX_TOKENS)
+            ),
+            rag_context_duplicate_similarity=float(
+                os.environ.get(
+                    "RAG_CONTEXT_DUPLICATE_SIMILARITY",
+                    DEFAULT_RAG_CONTEXT_DUPLICATE_SIMILARITY,
+                )
+            ),
+            sql_max_plan_cost=float(
+                os.environ.get("SQL_MAX_PLAN_COST", DEFAULT_SQL_MAX_PLAN_COST)
+            ),
+            sql_statement_timeout_ms=int(
+                os.environ.get(
+                    "SQL_STATEMENT_TIMEOUT_MS", DEFAULT_SQL_STATEMENT_TIMEOUT_MS
+                )
+            ),
+            sql_max_rows=int(os.environ.get("SQL_MAX_ROWS", DEFAULT_SQL_MAX_ROWS)),
+            sql_max_result_bytes=int(
+                os.environ.get("SQL_MAX_RESULT_BYTES", DEFAULT_SQL_MAX_RESULT_BYTES)
+            ),
+        )
+
+    @property
+    def db_secret(self):
+        """The DB secret, fetched on first use and refreshed after its TTL."""
+        with self._db_secret_lock:
+            secret_age = time.monotonic() - self._db_secret_fetched_at
+            if self._db_secret is None or secret_age > self.db_secret_ttl_seconds:
+                db_secret_string = secretsmanager_client.get_secret_value(
+                    SecretId=self.agent_db_secret_id
+                )["SecretString"]
+                self._db_secret = json.loads(db_secret_string)
+                self._db_secret_fetched_at = time.monotonic()
+            return self._db_secret
+
+    def get_db_connect_params(self):
+        """The psycopg2 connection parameters of the current DB secret."""
+        db_secret = self.db_secret
+        return {
+            "host": db_secret["host"],
+            "port": db_secret["port"],
+            "dbname": db_secret["dbname"],
+            "user": db_secret["username"],
+            "password": db_secret["password"],
+        }
+
+    @property
+    def sql_engine(self):
+        """The pooled engine shared by the vector store and the SQL tool.
+
+        The engine is created once, the credentials are read from the DB secret
+        for every new connection, so a rotated secret does not require a new
+        engine and the chains and caches holding the engine stay valid.
+        """
+        with self._sql_engine_lock:
+            if self._sql_engine is None:
+                self._sql_engine = create_pooled_engine(
+                    # The connection parameters come from get_db_connect_params.
+                    sqlalchemy.URL.create("postgresql+psycopg2"),
+                    pool_size=self.db_pool_size,
+                    max_overflow=self.db_max_overflow,
+                    pool_recycle_seconds=self.db_pool_recycle_seconds,
+                    pool_timeout_seconds=self.db_pool_timeout_seconds,
+                    connect_timeout_seconds=self.db_connect_timeout_seconds,
+                    session_settings={
+                        "hnsw.ef_search": self.vector_hnsw_ef_search,
+                        "ivfflat.probes": self.vector_ivfflat_probes,
+                    },
+                    get_connect_params=self.get_db_connect_params,
+                )
+            return self._sql_engine
+
+    @property
+    def entities_db(self):
+        """The SQL database of the entities, the tables are reflected on first use."""
+        from langchain.sql_database import SQLDatabase
+
+        sql_engine = self.sql_engine
+        with self._sql_engine_lock:
+            if self._entities_db is None:
+                self._entities_db = SQLDatabase(
+                    engine=sql_engine,
+                    include_tables=SQL_TABLE_NAMES,
+                    sample_rows_in_table_info=self.num_sql_table_sample_rows,
+                )
+            return self._entities_db
+
+
+@lru_cache(maxsize=None)
+def get_config():
+    """Return the process wide AgenticAssistantConfig."""
+    return AgenticAssistantConfig.from_environment()
@@ -0,0 +1,133 @@
+from typing import List, Optional
+
+import numpy as np
+from langchain.schema import Document
+
+from .retrieval import SearchResult
+from .tokens import CHARS_PER_TOKEN, approximate_num_tokens
+
+
+def remove_near_duplicates(
+    results: List[SearchResult], duplicate_similarity: float = 0.95
+) -> List[SearchResult]:
+    """Drop the results too similar to a more relevant result.
+
+    The results are expected in decreasing relevance. The pairwise cosine
+    similarities are computed once as a matrix product of the embeddings.
+    """
+    if len(results) < 2:
+        return list(results)
+
+    embeddings = np.stack([result.embedding for result in results])
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarity = embeddings @ embeddings.T
+
+    is_kept = np.zeros(len(results), dtype=bool)
+    for idx in range(len(results)):
+        if not np.any(similarity[idx, is_kept] >= duplicate_similarity):
+            is_kept[idx] = True
+    return [result for result, kept in zip(results, is_kept) if kept]
+
+
+def merge_overlapping_texts(
+    first_text: str, second_text: str, min_overlap_chars: int = 20
+) -> Optional[str]:
+    """Merge two texts when the end of the first one starts the second one.
+
+    Returns None when the texts do not overlap by at least min_overlap_chars.
+    """
+    if min(len(first_text), len(second_text)) < min_overlap_chars:
+        return None
+
+    second_text_start = second_text[:min_overlap_chars]
+    overlap_start = first_text.find(second_text_start)
+    while overlap_start != -1:
+        overlap = first_text[overlap_start:]
+        if second_text.startswith(overlap):
+            return first_text + second_text[len(overlap):]
+        overlap_start = first_text.find(second_text_start, overlap_start + 1)
+    return None
+
+
+def _get_page_key(document):
+    return (
+        document.metadata.get("document_name"),
+        document.metadata.get("page_number"),
+    )
+
+
+def merge_adjacent_chunks(
+    results: List[SearchResult], min_overlap_chars: int = 20
+) -> List[SearchResult]:
+    """Merge the chunks of the same page that overlap, e.g. consecutive chunks.
+
+    The merged chunk takes the place and the distance of the most relevant
+    of the two chunks.
+    """
+    merged_results = []
+    for result in results:
+        for idx, merged_result in enumerate(merged_results):
+            if _get_page_key(merged_result.document) != _get_page_key(
+                result.document
+            ):
+                continue
+            kept_text = merged_result.document.page_content
+            text = result.document.page_content
+            merged_text = merge_overlapping_texts(
+                kept_text, text, min_overlap_chars
+            ) or merge_overlapping_texts(text, kept_text, min_overlap_chars)
+            if merged_text is not None:
+                merged_results[idx] = merged_result._replace(
+                    document=Document(
+                        page_content=merged_text,
+                        metadata=merged_result.document.metadata,
+                    ),
+                    distance=min(merged_result.distance, result.distance),
+                )
+                break
+        else:
+            merged_results.append(result)
+    return merged_results
+
+
+class ContextPacker:
+    """Pack the retrieved chunks into the context of the "stuff" chain.
+
+    The near duplicate chunks are removed, the overlapping chunks of the
+    same page are merged, and the chunks are added by decreasing relevance
+    (1 - cosine distance) while they fit in max_tokens. The chunk with the
+    highest relevance is truncated if it does not fit on its own.
+    """
+
+    def __init__(
+        self, max_tokens=2000, duplicate_similarity=0.95, min_overlap_chars=20
+    ):
+        self.max_tokens = max_tokens
+        self.duplicate_similarity = duplicate_similarity
+        self.min_overlap_chars = min_overlap_chars
+
+    def pack(self, results: List[SearchResult]) -> List[Document]:
+        # The MMR and hybrid strategies return the results in their own order,
+        # the duplicates must be dropped in favour of the most relevant chunk.
+        results = sorted(results, key=lambda result: result.distance)
+        results = remove_near_duplicates(results, self.duplicate_similarity)
+        results = merge_adjacent_chunks(results, self.min_overlap_chars)
+
+        documents = []
+        num_tokens = 0
+        for result in results:
+            document_num_tokens = approximate_num_tokens(result.document.page_content)
+            if num_tokens + document_num_tokens <= self.max_tokens:
+                documents.append(result.document)
+                num_tokens += document_num_tokens
+            elif not documents:
+                documents.append(
+                    Document(
+                        page_content=result.document.page_content[
+                            : (self.max_tokens - 1) * CHARS_PER_TOKEN
+                        ],
+                        metadata=result.document.metadata,
+                    )
+                )
+                num_tokens = self.max_tokens
+        return documents
@@ -0,0 +1,116 @@
+import threading
+import time
+from dataclasses import dataclass, field, fields
+
+import sqlalchemy
+from sqlalchemy.pool import QueuePool
+
+
+@dataclass
+class PoolMetrics:
+    """Counters of the shared connection pool, cumulative per container."""
+
+    checkouts: int = 0
+    checkout_wait_ms_total: float = 0.0
+    checkout_wait_ms_max: float = 0.0
+    pool_exhausted: int = 0
+    connections_opened: int = 0
+    reconnects: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record_checkout(self, wait_ms):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_ms_total += wait_ms
+            self.checkout_wait_ms_max = max(self.checkout_wait_ms_max, wait_ms)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        # asdict would deep copy the lock, which cannot be copied.
+        with self._lock:
+            metrics = {
+                metric.name: getattr(self, metric.name)
+                for metric in fields(self)
+                if metric.name != "_lock"
+            }
+        metrics["checkout_wait_ms_total"] = round(metrics["checkout_wait_ms_total"], 2)
+        metrics["checkout_wait_ms_max"] = round(metrics["checkout_wait_ms_max"], 2)
+        return metrics
+
+
+POOL_METRICS = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool recording the checkout wait time and the pool exhaustions."""
+
+    def _do_get(self):
+        start_time = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sqlalchemy.exc.TimeoutError:
+            POOL_METRICS.increment("pool_exhausted")
+            raise
+        finally:
+            POOL_METRICS.record_checkout((time.perf_counter() - start_time) * 1000)
+
+
+def create_pooled_engine(
+    connection_url,
+    pool_size=4,
+    max_overflow=2,
+    pool_recycle_seconds=300,
+    pool_timeout_seconds=10,
+    connect_timeout_seconds=5,
+    session_settings=None,
+    get_connect_params=None,
+):
+    """Create the engine shared by the vector store and the SQL tool.
+
+    Connections are checked with a ping before use and recycled
+    periodically, to survive Aurora failovers and idle connection cleanup.
+    The session_settings, e.g. {"hnsw.ef_search": 40}, are set on every
+    new connection. get_connect_params, when given, is called for every new
+    connection and its psycopg2 parameters, e.g. {"password": ...}, override
+    the ones of the connection_url, so the engine picks up rotated credentials.
+    """
+    engine = sqlalchemy.create_engine(
+        connection_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=True,
+        pool_recycle=pool_recycle_seconds,
+        pool_timeout=pool_timeout_seconds,
+        connect_args={"connect_timeout": connect_timeout_seconds},
+    )
+
+    def on_connect(dbapi_connection, connection_record):
+        POOL_METRICS.increment("connections_opened")
+
+        if session_settings:
+            # Outside of a transaction, otherwise the settings are rolled back
+            # when the connection is returned to the pool.
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                for name, value in session_settings.items():
+                    cursor.execute(f"SET {name} = {value}")
+            dbapi_connection.autocommit = False
+
+    def on_do_connect(dialect, connection_record, cargs, cparams):
+        cparams.update(get_connect_params())
+
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        # Invalidated connections, e.g. failing the pre ping, are reopened.
+        POOL_METRICS.increment("reconnects")
+
+    if get_connect_params is not None:
+        sqlalchemy.event.listen(engine, "do_connect", on_do_connect)
+    sqlalchemy.event.listen(engine, "connect", on_connect)
+    sqlalchemy.event.listen(engine, "invalidate", on_invalidate)
+    return engine
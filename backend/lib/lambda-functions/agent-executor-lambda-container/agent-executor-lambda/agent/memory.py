@@ -0,0 +1,191 @@
+import asyncio
+from typing import Any, Dict, List
+
+from langchain.chains import LLMChain
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.schema import BaseMessage, get_buffer_string
+from langchain.schema.language_model import BaseLanguageModel
+
+from .chat_history import (
+    SUMMARY_TURN,
+    get_dynamodb_table,
+    get_expires_at,
+    needs_expiration_refresh,
+)
+from .prompts import CLAUDE_SUMMARY_PROMPT
+from .tokens import approximate_num_tokens
+
+
+class DynamoDBSessionSummaryStore:
+    """Persist the running summary of a session next to its chat history.
+
+    The summary is stored in the reserved SUMMARY_TURN item of the session
+    in the chat history table, with the number of messages that were already
+    folded into it so it can be updated incrementally. The summary item is
+    missing for new sessions, and if it expired the memory summarizes again
+    from the oldest turn still stored.
+    """
+
+    def __init__(self, table_name, session_id, ttl_seconds, endpoint_url=None):
+        self.table = get_dynamodb_table(table_name, endpoint_url)
+        self.key = {"SessionId": session_id, "Turn": SUMMARY_TURN}
+        self.ttl_seconds = ttl_seconds
+        self._item = None
+
+    def load(self):
+        self._item = self.table.get_item(Key=self.key).get("Item")
+        item = self._item or {}
+        return item.get("Summary", ""), int(item.get("SummarizedMessagesCount", 0))
+
+    def save(self, summary, summarized_messages_count):
+        self._item = {
+            **self.key,
+            "Summary": summary,
+            "SummarizedMessagesCount": summarized_messages_count,
+            "ExpiresAt": get_expires_at(self.ttl_seconds),
+        }
+        self.table.put_item(Item=self._item)
+
+    def refresh_expiration(self):
+        """Push back the expiration of the summary of an active session."""
+        if self._item is None or not needs_expiration_refresh(
+            self._item.get("ExpiresAt"), self.ttl_seconds
+        ):
+            return
+        self._item["ExpiresAt"] = get_expires_at(self.ttl_seconds)
+        self.table.update_item(
+            Key=self.key,
+            UpdateExpression="SET ExpiresAt = :expires_at",
+            ExpressionAttributeValues={":expires_at": self._item["ExpiresAt"]},
+        )
+
+    def clear(self):
+        self.table.delete_item(Key=self.key)
+        self._item = None
+
+
+class SummaryWindowChatMemory(BaseChatMemory):
+    """Keep the last turns verbatim and a running summary of older turns.
+
+    The window holds at most max_turns turns and max_token_limit tokens.
+    When a saved turn makes the window overflow, the oldest turns are folded
+    into the running summary summary_batch_turns at a time (the token budget
+    shrinks by the same fraction), so the summary LLM call runs once every
+    summary_batch_turns turns instead of on every turn. The summary is never
+    recomputed from the full history. The chat_memory only needs to hold the
+    recent messages, first_message_index gives their offset in the full history.
+    """
+
+    llm: BaseLanguageModel
+    summary_store: Any
+    memory_key: str = "history"
+    human_prefix: str = "Human"
+    ai_prefix: str = "AI"
+    max_turns: int = 5
+    max_token_limit: int = 1000
+    summary_batch_turns: int = 2
+
+    summary: str = ""
+    summarized_messages_count: int = 0
+    summary_loaded: bool = False
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def _get_window_start(
+        self, messages: List[BaseMessage], max_turns: int, max_token_limit: int
+    ) -> int:
+        """Return the index of the first message kept verbatim."""
+        window_start = len(messages)
+        window_tokens = 0
+        min_window_start = max(len(messages) - 2 * max_turns, 0)
+        for idx in range(len(messages) - 1, min_window_start - 1, -1):
+            window_tokens += approximate_num_tokens(
+                get_buffer_string(
+                    [messages[idx]],
+                    human_prefix=self.human_prefix,
+                    ai_prefix=self.ai_prefix,
+                )
+            )
+            if window_tokens > max_token_limit:
+                break
+            window_start = idx
+        return window_start
+
+    def _get_low_window_start(self, messages: List[BaseMessage]) -> int:
+        """Return the start of the window left after a summarization."""
+        min_turns = max(self.max_turns + 1 - self.summary_batch_turns, 1)
+        return self._get_window_start(
+            messages,
+            min_turns,
+            self.max_token_limit * min_turns // self.max_turns,
+        )
+
+    def _load_summary(self):
+        if not self.summary_loaded:
+            self.summary, self.summarized_messages_count = self.summary_store.load()
+            self.summary_loaded = True
+
+    async def aprefetch(self) -> None:
+        """Read the recent messages and the running summary concurrently."""
+        await asyncio.gather(
+            asyncio.to_thread(lambda: self.chat_memory.messages),
+            asyncio.to_thread(self._load_summary),
+        )
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        self._load_summary()
+        messages = self.chat_memory.messages
+        window_start = max(
+            self._get_window_start(messages, self.max_turns, self.max_token_limit),
+            self.summarized_messages_count - self.chat_memory.first_message_index,
+        )
+        window = get_buffer_string(
+            messages[window_start:],
+            human_prefix=self.human_prefix,
+            ai_prefix=self.ai_prefix,
+        )
+        if self.summary:
+            window = (
+                f"Summary of the earlier conversation: {self.summary}\n{window}"
+            )
+        return {self.memory_key: window}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self._load_summary()
+
+        messages = self.chat_memory.messages
+        messages_offset = self.chat_memory.first_message_index
+        window_start = messages_offset + self._get_window_start(
+            messages, self.max_turns, self.max_token_limit
+        )
+        if window_start <= self.summarized_messages_count:
+            self.summary_store.refresh_expiration()
+            return
+
+        # Fold a batch of turns at once, down to the low mark of the window.
+        window_start = messages_offset + self._get_low_window_start(messages)
+
+        new_lines = get_buffer_string(
+            messages[
+                max(self.summarized_messages_count - messages_offset, 0):
+                window_start - messages_offset
+            ],
+            human_prefix=self.human_prefix,
+            ai_prefix=self.ai_prefix,
+        )
+        summary_chain = LLMChain(llm=self.llm, prompt=CLAUDE_SUMMARY_PROMPT)
+        self.summary = summary_chain.predict(
+            summary=self.summary, new_lines=new_lines
+        ).strip()
+        self.summarized_messages_count = window_start
+        self.summary_store.save(self.summary, self.summarized_messages_count)
+
+    def clear(self) -> None:
+        super().clear()
+        self.summary_store.clear()
+        self.summary = ""
+        self.summarized_messages_count = 0
+        self.summary_loaded = True
@@ -0,0 +1,80 @@
+import re
+import threading
+import time
+from typing import Dict, List
+
+import sqlalchemy
+
+# Metadata of the documents chunks that can be used to filter the semantic
+# search, they are merged from the S3 metadata of the documents during ingestion.
+FILTERABLE_METADATA_KEYS = ["company", "year"]
+
+# The distinct values are recorded by the ingestion pipeline, see
+# record_metadata_values in data-pipelines/scripts/prepare_and_load_embeddings.py.
+_METADATA_VALUES_QUERY = sqlalchemy.text(
+    "SELECT metadata_key, metadata_value FROM collection_metadata_values"
+    " WHERE collection_name = :collection_name"
+)
+
+
+class MetadataLexicon:
+    """The known values of the filterable metadata of a collection.
+
+    The values are read from the lookup table written at ingestion and
+    refreshed at most every refresh_interval_seconds.
+    """
+
+    def __init__(self, engine, collection_name, refresh_interval_seconds=3600):
+        self.engine = engine
+        self.collection_name = collection_name
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self._values = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load_values(self):
+        values = {key: [] for key in FILTERABLE_METADATA_KEYS}
+        try:
+            with self.engine.connect() as connection:
+                rows = connection.execute(
+                    _METADATA_VALUES_QUERY,
+                    {"collection_name": self.collection_name},
+                ).fetchall()
+        except sqlalchemy.exc.ProgrammingError as e:
+            # The collection was ingested before the values were recorded,
+            # the semantic search is not filtered until it is ingested again.
+            print(f"The metadata values could not be loaded: {e}")
+            return values
+
+        for key, value in rows:
+            if key in values:
+                values[key].append(value)
+        return {key: sorted(key_values) for key, key_values in values.items()}
+
+    def get_values(self) -> Dict[str, List[str]]:
+        with self._lock:
+            values_age = time.monotonic() - self._loaded_at
+            if self._values is None or values_age > self.refresh_interval_seconds:
+                self._values = self._load_values()
+                self._loaded_at = time.monotonic()
+            return self._values
+
+
+def extract_metadata_filter(question, known_values):
+    """Build a metadata filter from the known values mentioned in the question.
+
+    A value matches when it appears as a whole word, ignoring the case.
+    Several matching values of the same key are combined with "in".
+    """
+    metadata_filter = {}
+    for key, values in known_values.items():
+        matches = [
+            value
+            for value in values
+            if re.search(rf"\b{re.escape(value)}\b", question, flags=re.IGNORECASE)
+        ]
+        if len(matches) == 1:
+            metadata_filter[key] = matches[0]
+        elif matches:
+            metadata_filter[key] = {"in": matches}
+    return metadata_filter
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Union
+
+from langchain.agents import Tool
+from langchain.agents.mrkl.output_parser import MRKLOutputParser
+from langchain.schema import AgentAction, AgentFinish
+
+PARALLEL_ACTIONS_TOOL_NAME = "ParallelActions"
+
+_ACTION_REGEX = re.compile(
+    r"Action\s*\d*\s*:[\s]*(.*?)[\s]*Action\s*\d*\s*Input\s*\d*\s*:[\s]*(.*?)"
+    r"(?=\n\s*(?:Thought\s*:|Action\s*\d*\s*:)|\Z)",
+    re.DOTALL,
+)
+
+
+class ParallelActionsOutputParser(MRKLOutputParser):
+    """Parse one or several independent Action/Action Input pairs.
+
+    A single action is parsed as usual. Several actions in the same step are
+    grouped into one action of the ParallelActions tool, which runs them
+    concurrently and returns all their observations at once.
+    """
+
+    def parse(self, text: str) -> Union[AgentAction, AgentFinish]:
+        actions = _ACTION_REGEX.findall(text)
+        if len(actions) <= 1:
+            return super().parse(text)
+
+        tool_input = [
+            {"tool": tool.strip(), "tool_input": tool_input.strip().strip('"')}
+            for tool, tool_input in actions
+        ]
+        return AgentAction(PARALLEL_ACTIONS_TOOL_NAME, json.dumps(tool_input), text)
+
+
+def _run_tool(tools_by_name, action):
+    tool = tools_by_name.get(action["tool"])
+    if tool is None:
+        return (
+            f"{action['tool']} is not a valid tool,"
+            f" try one of [{', '.join(tools_by_name)}]."
+        )
+    try:
+        return str(tool.run(action["tool_input"]))
+    except Exception as e:
+        return f"{action['tool']} failed with error {e}."
+
+
+async def _arun_tool(tools_by_name, action):
+    tool = tools_by_name.get(action["tool"])
+    if tool is None:
+        return _run_tool(tools_by_name, action)
+    try:
+        return str(await tool.arun(action["tool_input"]))
+    except Exception as e:
+        return f"{action['tool']} failed with error {e}."
+
+
+def _format_observations(actions, observations):
+    return "\n".join(
+        f"Observation of {action['tool']} for {action['tool_input']}: {observation}"
+        for action, observation in zip(actions, observations)
+    )
+
+
+def get_parallel_actions_tool(tools: List[Tool], max_workers: int = 4) -> Tool:
+    """Create the tool dispatching the grouped actions concurrently."""
+    tools_by_name = {tool.name: tool for tool in tools}
+
+    def run_parallel_actions(tool_input: str) -> str:
+        actions = json.loads(tool_input)
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(actions))) as pool:
+            observations = list(
+                pool.map(lambda action: _run_tool(tools_by_name, action), actions)
+            )
+
+        return _format_observations(actions, observations)
+
+    async def arun_parallel_actions(tool_input: str) -> str:
+        actions = json.loads(tool_input)
+        observations = await asyncio.gather(
+            *[_arun_tool(tools_by_name, action) for action in actions]
+        )
+        return _format_observations(actions, observations)
+
+    return Tool(
+        name=PARALLEL_ACTIONS_TOOL_NAME,
+        func=run_parallel_actions,
+        coroutine=arun_parallel_actions,
+        description=(
+            "Internal tool that runs several independent actions concurrently."
+        ),
+    )
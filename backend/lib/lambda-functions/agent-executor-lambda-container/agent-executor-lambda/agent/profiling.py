@@ -0,0 +1,55 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Set AGENT_STARTUP_PROFILING=true to record the wall time of the imports
+# and initializers executed while the container warms up.
+STARTUP_PROFILING_ENABLED = (
+    os.environ.get("AGENT_STARTUP_PROFILING", "false").lower() == "true"
+)
+
+_startup_timings = []
+_startup_profile_emitted = False
+
+
+@contextmanager
+def profile_startup(name, kind="initializer"):
+    """Record the wall time of an import or initializer block."""
+    if not STARTUP_PROFILING_ENABLED:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        _startup_timings.append(
+            {
+                "name": name,
+                "kind": kind,
+                "duration_ms": round((time.perf_counter() - start_time) * 1000, 2),
+            }
+        )
+
+
+def emit_startup_profile(logger, chatbot_type):
+    """Log the recorded startup timings once, on the first invocation."""
+    global _startup_profile_emitted
+
+    if not STARTUP_PROFILING_ENABLED or _startup_profile_emitted:
+        return
+
+    _startup_profile_emitted = True
+    logger.info(
+        json.dumps(
+            {
+                "event": "startup_profile",
+                "chatbot_type": chatbot_type,
+                "total_ms": round(
+                    sum(timing["duration_ms"] for timing in _startup_timings), 2
+                ),
+                "timings": _startup_timings,
+            }
+        )
+    )
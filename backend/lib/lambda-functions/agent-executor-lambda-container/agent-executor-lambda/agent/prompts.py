@@ -25,6 +25,28 @@ CLAUDE_PROMPT = PromptTemplate(
     input_variables=["history", "input"], template=_CALUDE_PROMPT_TEMPLATE
 )
 
+# ============================================================================
+# Claude chat history summary prompt construction
+# ============================================================================
+
+_CLAUDE_SUMMARY_PROMPT_TEMPLATE = """\n\nHuman: Progressively summarize the lines of conversation within the <new_lines></new_lines> XML tags,
+where Hu refers to the human and AI refers to the assistant, adding onto the current summary within the <summary></summary> XML tags.
+Keep the names, dates and numbers that may be needed to answer later questions, and only return the new summary.
+
+<summary>
+{summary}
+</summary>
+
+<new_lines>
+{new_lines}
+</new_lines>
+
+Assistant:"""
+
+CLAUDE_SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["summary", "new_lines"], template=_CLAUDE_SUMMARY_PROMPT_TEMPLATE
+)
+
 # ============================================================================
 # Claude agentic chatbot prompt construction
 # ============================================================================
@@ -48,6 +70,7 @@ Action: the action to take, must be one of [{tool_names}]
 Action Input: the input to the action
 Observation: the result of the action
 ... (this Thought/Action/Action Input/Observation can repeat N times)
+When several actions are independent of each other, write their Action/Action Input pairs one after the other before a single Observation, they will be run at the same time.
 Thought: I now know the final answer
 Final Answer: the final answer to the original input question
 
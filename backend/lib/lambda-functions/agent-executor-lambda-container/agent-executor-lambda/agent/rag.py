@@ -1,6 +1,9 @@
 from langchain.chains import RetrievalQA
 from langchain.embeddings import BedrockEmbeddings
-from langchain.vectorstores import PGVector
+
+from .context_packing import ContextPacker
+from .metadata_filter import MetadataLexicon
+from .retrieval import ConfigurableRetriever, PGVectorSearch
 
 
 def get_rag_chain(config, llm, bedrock_runtime):
@@ -10,16 +13,33 @@ def get_rag_chain(config, llm, bedrock_runtime):
         model_id=config.embedding_model_id, client=bedrock_runtime
     )
 
-    vector_store = PGVector.from_existing_index(
-        embedding=embedding_model,
-        collection_name=config.collection_name,
-        connection_string=config.postgres_connection_string,
+    retriever = ConfigurableRetriever(
+        vector_search=PGVectorSearch(
+            config.sql_engine,
+            config.collection_name,
+            hnsw_ef_search=config.vector_hnsw_ef_search,
+            hnsw_filtered_ef_search=config.vector_hnsw_filtered_ef_search,
+        ),
+        embedding_model=embedding_model,
+        # Restricts the search to the company and year mentioned in the question.
+        metadata_lexicon=MetadataLexicon(config.sql_engine, config.collection_name),
+        strategy=config.retrieval_strategy,
+        k=config.retrieval_k,
+        fetch_k=config.retrieval_fetch_k,
+        lambda_mult=config.retrieval_lambda_mult,
+        score_threshold=config.retrieval_score_threshold,
+        hybrid_search=config.retrieval_hybrid_search,
+        # Fits the chunks stuffed in the prompt in a token budget.
+        context_packer=ContextPacker(
+            max_tokens=config.rag_context_max_tokens,
+            duplicate_similarity=config.rag_context_duplicate_similarity,
+        ),
     )
 
     return RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
-        retriever=vector_store.as_retriever(k=5, fetch_k=50),
+        retriever=retriever,
         # TODO: Pass the source documents names as part of the final answer.
         return_source_documents=False,
         input_key="question",
@@ -0,0 +1,352 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import sqlalchemy
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.schema import BaseRetriever, Document
+from langchain.schema.embeddings import Embeddings
+
+from .metadata_filter import extract_metadata_filter
+
+RETRIEVAL_STRATEGIES = ["similarity", "mmr", "similarity_score_threshold"]
+
+# Cosine distance to the query of the embeddings of a collection, served by
+# the ANN index built by data-pipelines/scripts/prepare_and_load_embeddings.py.
+_VECTOR_SEARCH_QUERY = """
+SELECT e.uuid, e.document, e.cmetadata, e.embedding,
+    e.embedding <=> CAST(:query_embedding AS vector) AS distance
+FROM langchain_pg_embedding e
+JOIN langchain_pg_collection c ON e.collection_id = c.uuid
+WHERE c.name = :collection_name {metadata_filter_clause}
+ORDER BY distance
+LIMIT :limit
+"""
+
+# Full text search over the document_tsv column and its GIN index built by
+# data-pipelines/scripts/prepare_and_load_embeddings.py. The words of the
+# query are OR-ed, the chunks matching more and rarer words rank higher.
+_LEXICAL_SEARCH_QUERY = """
+SELECT e.uuid, e.document, e.cmetadata, e.embedding,
+    e.embedding <=> CAST(:query_embedding AS vector) AS distance
+FROM langchain_pg_embedding e
+JOIN langchain_pg_collection c ON e.collection_id = c.uuid,
+    to_tsquery(
+        'english', replace(plainto_tsquery('english', :query_text)::text, '&', '|')
+    ) AS query
+WHERE c.name = :collection_name AND e.document_tsv @@ query
+    {metadata_filter_clause}
+ORDER BY ts_rank_cd(e.document_tsv, query) DESC
+LIMIT :limit
+"""
+
+# Runs the lexical and vector searches of a question concurrently.
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+
+class SearchResult(NamedTuple):
+    id: str
+    document: Document
+    distance: float
+    embedding: np.ndarray
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[SearchResult]], rrf_k: int = 60
+) -> List[SearchResult]:
+    """Fuse ranked results, scoring each result by sum(1 / (rrf_k + rank))."""
+    scores = {}
+    results_by_id = {}
+    for ranked_list in ranked_lists:
+        for rank, result in enumerate(ranked_list, start=1):
+            scores[result.id] = scores.get(result.id, 0.0) + 1.0 / (rrf_k + rank)
+            results_by_id[result.id] = result
+    return [
+        results_by_id[result_id]
+        for result_id in sorted(scores, key=scores.get, reverse=True)
+    ]
+
+
+def maximal_marginal_relevance(
+    query_embedding: np.ndarray,
+    candidate_embeddings: np.ndarray,
+    k: int = 4,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """Select the indices of the candidates with maximal marginal relevance.
+
+    The query and pairwise candidate similarities are computed once as
+    matrix products, and the maximum similarity of each candidate to the
+    selected ones is updated with one vectorized operation per selection.
+    """
+    if len(candidate_embeddings) == 0 or k <= 0:
+        return []
+
+    candidates = candidate_embeddings / np.linalg.norm(
+        candidate_embeddings, axis=1, keepdims=True
+    )
+    query = query_embedding / np.linalg.norm(query_embedding)
+
+    query_similarity = candidates @ query
+    pairwise_similarity = candidates @ candidates.T
+
+    selected = [int(np.argmax(query_similarity))]
+    max_similarity_to_selected = pairwise_similarity[selected[0]].copy()
+    is_selected = np.zeros(len(candidates), dtype=bool)
+    is_selected[selected[0]] = True
+
+    while len(selected) < min(k, len(candidates)):
+        mmr_scores = (
+            lambda_mult * query_similarity
+            - (1 - lambda_mult) * max_similarity_to_selected
+        )
+        mmr_scores[is_selected] = -np.inf
+        next_idx = int(np.argmax(mmr_scores))
+        selected.append(next_idx)
+        is_selected[next_idx] = True
+        np.maximum(
+            max_similarity_to_selected,
+            pairwise_similarity[next_idx],
+            out=max_similarity_to_selected,
+        )
+
+    return selected
+
+
+def _parse_embedding(embedding) -> np.ndarray:
+    # pgvector returns the vectors as text unless its adapter is registered.
+    if isinstance(embedding, str):
+        embedding = json.loads(embedding)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def build_metadata_filter_clause(metadata_filter) -> Tuple[str, Dict[str, Any]]:
+    """Translate a metadata filter into a SQL clause on the chunks metadata."""
+    clauses = []
+    params = {}
+    for idx, (key, value) in enumerate(metadata_filter.items()):
+        params[f"filter_key_{idx}"] = key
+        if isinstance(value, dict):
+            clauses.append(
+                f"e.cmetadata ->> :filter_key_{idx} = ANY(:filter_value_{idx})"
+            )
+            params[f"filter_value_{idx}"] = [str(v) for v in value["in"]]
+        else:
+            clauses.append(f"e.cmetadata ->> :filter_key_{idx} = :filter_value_{idx}")
+            params[f"filter_value_{idx}"] = str(value)
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+class PGVectorSearch:
+    """Query the chunks of a collection with the shared engine.
+
+    The HNSW index returns at most hnsw.ef_search rows, the vector search
+    raises it to the number of rows fetched for the duration of the query.
+    The metadata filter is applied to the rows returned by the index, the
+    filtered searches use the larger hnsw_filtered_ef_search to still find
+    enough matching rows.
+
+    The full text search needs the document_tsv column added by the ingestion,
+    on collections ingested without it the search_by_text results are empty
+    and the hybrid search falls back to the vector search results.
+    """
+
+    def __init__(
+        self, engine, collection_name, hnsw_ef_search=40, hnsw_filtered_ef_search=200
+    ):
+        self.engine = engine
+        self.collection_name = collection_name
+        self.hnsw_ef_search = hnsw_ef_search
+        self.hnsw_filtered_ef_search = hnsw_filtered_ef_search
+        self.lexical_search_available = True
+
+    def _search(
+        self, query_template, limit, metadata_filter, ef_search=None, **params
+    ):
+        metadata_filter_clause, filter_params = build_metadata_filter_clause(
+            metadata_filter or {}
+        )
+        query = sqlalchemy.text(
+            query_template.format(metadata_filter_clause=metadata_filter_clause)
+        )
+        with self.engine.connect() as connection:
+            if ef_search is not None:
+                # Local to the transaction of the query, like SET LOCAL.
+                connection.execute(
+                    sqlalchemy.text(
+                        "SELECT set_config('hnsw.ef_search', :ef_search, true)"
+                    ),
+                    {"ef_search": str(ef_search)},
+                )
+            rows = connection.execute(
+                query,
+                {
+                    "collection_name": self.collection_name,
+                    "limit": limit,
+                    **params,
+                    **filter_params,
+                },
+            ).fetchall()
+
+        return [
+            SearchResult(
+                id=str(uuid),
+                document=Document(page_content=document, metadata=metadata or {}),
+                distance=distance,
+                embedding=_parse_embedding(embedding),
+            )
+            for uuid, document, metadata, embedding, distance in rows
+        ]
+
+    def search_by_vector(
+        self, query_embedding, limit, metadata_filter=None
+    ) -> List[SearchResult]:
+        """Return the chunks closest to the query embedding."""
+        ef_search = (
+            self.hnsw_filtered_ef_search if metadata_filter else self.hnsw_ef_search
+        )
+        return self._search(
+            _VECTOR_SEARCH_QUERY,
+            limit,
+            metadata_filter,
+            ef_search=max(ef_search, limit),
+            query_embedding=str(list(query_embedding)),
+        )
+
+    def search_by_text(
+        self, query_text, query_embedding, limit, metadata_filter=None
+    ) -> List[SearchResult]:
+        """Return the chunks ranked by full text search of the query."""
+        if not self.lexical_search_available:
+            return []
+        try:
+            return self._search(
+                _LEXICAL_SEARCH_QUERY,
+                limit,
+                metadata_filter,
+                query_text=query_text,
+                query_embedding=str(list(query_embedding)),
+            )
+        except sqlalchemy.exc.ProgrammingError as e:
+            # e.g. the document_tsv column does not exist, do not retry it.
+            print(f"Full text search unavailable, using the vector search only: {e}")
+            self.lexical_search_available = False
+            return []
+
+
+class ConfigurableRetriever(BaseRetriever):
+    """Retrieve documents with a configurable strategy.
+
+    The supported strategies are:
+        similarity: the k closest chunks.
+        mmr: k chunks re-ranked with maximal marginal relevance among the
+            fetch_k closest ones, lambda_mult trades relevance for diversity.
+        similarity_score_threshold: the k closest chunks with a relevance
+            score (1 - cosine distance) of at least score_threshold.
+
+    With hybrid_search, the candidates of each strategy come from a vector
+    search and a full text search run concurrently and fused with reciprocal
+    rank fusion, which helps with exact tokens such as names and years.
+
+    The company and year mentioned in the question are pushed into the
+    query as a metadata filter, the unfiltered search completes the results
+    when fewer than k documents match.
+
+    The retrieved chunks are packed by the context_packer, if any, e.g. a
+    context_packing.ContextPacker, before being passed to the LLM.
+    """
+
+    vector_search: Any
+    embedding_model: Embeddings
+    metadata_lexicon: Optional[Any] = None
+    strategy: str = "mmr"
+    k: int = 5
+    fetch_k: int = 50
+    lambda_mult: float = 0.5
+    score_threshold: float = 0.5
+    hybrid_search: bool = True
+    context_packer: Optional[Any] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _fetch_candidates(self, query, query_embedding, limit, metadata_filter):
+        if not self.hybrid_search:
+            return self.vector_search.search_by_vector(
+                query_embedding, limit, metadata_filter
+            )
+
+        vector_results = _SEARCH_EXECUTOR.submit(
+            self.vector_search.search_by_vector,
+            query_embedding,
+            limit,
+            metadata_filter,
+        )
+        lexical_results = _SEARCH_EXECUTOR.submit(
+            self.vector_search.search_by_text,
+            query,
+            query_embedding,
+            limit,
+            metadata_filter,
+        )
+        return reciprocal_rank_fusion(
+            [vector_results.result(), lexical_results.result()]
+        )[:limit]
+
+    def _search(self, query, query_embedding, metadata_filter):
+        if self.strategy == "mmr":
+            candidates = self._fetch_candidates(
+                query, query_embedding, self.fetch_k, metadata_filter
+            )
+            if not candidates:
+                return []
+            selected = maximal_marginal_relevance(
+                np.asarray(query_embedding, dtype=np.float32),
+                np.stack([candidate.embedding for candidate in candidates]),
+                k=self.k,
+                lambda_mult=self.lambda_mult,
+            )
+            return [candidates[idx] for idx in selected]
+
+        results = self._fetch_candidates(
+            query, query_embedding, self.k, metadata_filter
+        )
+        if self.strategy == "similarity_score_threshold":
+            results = [
+                result
+                for result in results
+                if 1 - result.distance >= self.score_threshold
+            ]
+        return results
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if self.strategy not in RETRIEVAL_STRATEGIES:
+            raise ValueError(
+                f"The retrieval strategy must be one of {RETRIEVAL_STRATEGIES},"
+                f" got {self.strategy}"
+            )
+
+        query_embedding = self.embedding_model.embed_query(query)
+
+        metadata_filter = {}
+        if self.metadata_lexicon is not None:
+            metadata_filter = extract_metadata_filter(
+                query, self.metadata_lexicon.get_values()
+            )
+        results = []
+        if metadata_filter:
+            results = self._search(query, query_embedding, metadata_filter)
+        if len(results) < self.k:
+            result_ids = {result.id for result in results}
+            results += [
+                result
+                for result in self._search(query, query_embedding, None)
+                if result.id not in result_ids
+            ][: self.k - len(results)]
+
+        if self.context_packer is not None:
+            return self.context_packer.pack(results)
+        return [result.document for result in results]
@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Sequence
+
+import sqlalchemy
+from langchain.sql_database import SQLDatabase
+
+# Table maintained by data-pipelines/scripts/load_sql_tables.py,
+# the version of a table is bumped every time the table is reloaded.
+TABLE_VERSIONS_TABLE_NAME = "sql_table_versions"
+
+_TABLE_VERSIONS_QUERY = sqlalchemy.text(
+    f"SELECT table_name, version FROM {TABLE_VERSIONS_TABLE_NAME}"
+    " WHERE table_name IN :table_names"
+).bindparams(sqlalchemy.bindparam("table_names", expanding=True))
+
+# Columns of the materialized views, which SQLDatabase does not reflect.
+_MATERIALIZED_VIEW_COLUMNS_QUERY = sqlalchemy.text(
+    "SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod)"
+    " FROM pg_class c JOIN pg_attribute a ON a.attrelid = c.oid"
+    " WHERE c.relkind = 'm' AND c.relname IN :view_names"
+    " AND a.attnum > 0 AND NOT a.attisdropped"
+    " ORDER BY c.relname, a.attnum"
+).bindparams(sqlalchemy.bindparam("view_names", expanding=True))
+
+
+class SQLSchemaContextCache:
+    """Cache the schema and sample rows description of the SQL tables.
+
+    SQLDatabase.get_table_info inspects the schema and selects sample rows of
+    every table on each call. The description is cached per set of tables and
+    rebuilt only when the version of one of the tables changes. The versions
+    are checked at most every version_check_interval_seconds.
+
+    The existing summary_view_names materialized views are described after
+    the tables, they are refreshed by the loader with the table versions.
+    """
+
+    def __init__(
+        self,
+        db: SQLDatabase,
+        engine: sqlalchemy.Engine,
+        version_check_interval_seconds: int = 60,
+        summary_view_names: Sequence[str] = (),
+    ):
+        self.db = db
+        self.engine = engine
+        self.version_check_interval_seconds = version_check_interval_seconds
+        self.summary_view_names = list(summary_view_names)
+        # table names -> (table versions, version check time)
+        self._table_versions = {}
+        # table names -> (table versions, table info)
+        self._table_info = {}
+        self._lock = threading.Lock()
+
+    def _get_cache_key(self, table_names=None):
+        return tuple(sorted(table_names or self.db.get_usable_table_names()))
+
+    def get_table_versions(self, table_names):
+        """Return the loaded version of the tables, None if they are not tracked."""
+        try:
+            with self.engine.connect() as connection:
+                rows = connection.execute(
+                    _TABLE_VERSIONS_QUERY, {"table_names": list(table_names)}
+                ).fetchall()
+        except sqlalchemy.exc.SQLAlchemyError:
+            # The tables were loaded before the versions were tracked.
+            return None
+        return tuple(sorted((row[0], row[1]) for row in rows))
+
+    def get_current_table_versions(self, table_names=None):
+        """Return the table versions, queried at most once per check interval."""
+        cache_key = self._get_cache_key(table_names)
+        with self._lock:
+            cached = self._table_versions.get(cache_key)
+            if cached is not None:
+                table_versions, checked_at = cached
+                if time.monotonic() - checked_at < self.version_check_interval_seconds:
+                    return table_versions
+
+            table_versions = self.get_table_versions(cache_key)
+            self._table_versions[cache_key] = (table_versions, time.monotonic())
+            return table_versions
+
+    def get_summary_views_info(self):
+        """Describe the columns of the existing summary views."""
+        if not self.summary_view_names:
+            return ""
+        try:
+            with self.engine.connect() as connection:
+                rows = connection.execute(
+                    _MATERIALIZED_VIEW_COLUMNS_QUERY,
+                    {"view_names": self.summary_view_names},
+                ).fetchall()
+        except sqlalchemy.exc.SQLAlchemyError:
+            return ""
+
+        view_columns = {}
+        for view_name, column_name, column_type in rows:
+            view_columns.setdefault(view_name, []).append(
+                f"\t{column_name} {column_type.upper()}"
+            )
+        return "".join(
+            f"\n\nCREATE MATERIALIZED VIEW {view_name} (\n"
+            + ", \n".join(columns)
+            + "\n)"
+            for view_name, columns in view_columns.items()
+        )
+
+    def get_table_info(self, table_names=None):
+        cache_key = self._get_cache_key(table_names)
+        table_versions = self.get_current_table_versions(cache_key)
+
+        with self._lock:
+            cached = self._table_info.get(cache_key)
+            if cached is not None and cached[0] == table_versions:
+                return cached[1]
+
+            table_info = self.db.get_table_info(table_names=list(cache_key))
+            table_info += self.get_summary_views_info()
+            self._table_info[cache_key] = (table_versions, table_info)
+            return table_info
@@ -0,0 +1,76 @@
+import re
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """A thread safe dict with a maximum size evicting the least recently used keys."""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._items.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def normalize_question(question):
+    """Normalize the case, the whitespaces and the trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.!").strip().lower()
+
+
+def canonicalize_sql(sql_query):
+    """Normalize the whitespaces and the trailing semicolon of a SQL query.
+
+    The case is kept since it matters for the string literals.
+    """
+    return re.sub(r"\s+", " ", sql_query).strip().rstrip(";").strip() + ";"
+
+
+class TextToSQLCache:
+    """Two level cache of the SQL QA tool: question -> SQL and SQL -> result.
+
+    The keys include the versions of the loaded tables, so reloading a table
+    makes the cached entries unreachable and they are evicted as least
+    recently used.
+    """
+
+    def __init__(self, max_size=256):
+        self.question_to_sql = LRUCache(max_size)
+        self.sql_to_result = LRUCache(max_size)
+
+    def get_sql(self, question, initial_context, table_versions):
+        return self.question_to_sql.get(
+            (normalize_question(question), initial_context.strip(), table_versions)
+        )
+
+    def put_sql(self, question, initial_context, table_versions, sql_query):
+        self.question_to_sql.put(
+            (normalize_question(question), initial_context.strip(), table_versions),
+            sql_query,
+        )
+
+    def get_result(self, sql_query, table_versions):
+        return self.sql_to_result.get((canonicalize_sql(sql_query), table_versions))
+
+    def put_result(self, sql_query, table_versions, result):
+        self.sql_to_result.put((canonicalize_sql(sql_query), table_versions), result)
@@ -7,12 +7,15 @@ from langchain.schema.runnable import RunnableMap, RunnableSequence
 from langchain.sql_database import SQLDatabase
 from langchain.chains.sql_database.query import SQLInput, SQLInputWithTables, _strip
 
+from .schema_cache import SQLSchemaContextCache
+
 
 def create_sql_query_generation_chain(
     llm: BaseLanguageModel,
     db: SQLDatabase,
     prompt: Optional[BasePromptTemplate] = None,
     k: int = 5,
+    schema_cache: Optional[SQLSchemaContextCache] = None,
 ) -> RunnableSequence[Union[SQLInput, SQLInputWithTables], str]:
     """Create a chain that generates SQL queries.
 
@@ -22,6 +25,9 @@ def create_sql_query_generation_chain(
         prompt: The prompt to use. If none is provided, will choose one
             based on dialect. Defaults to None.
         k: The number of results per select statement to return. Defaults to 5.
+        schema_cache: The cache of the tables schema and sample rows to use
+            instead of querying them from the db for every question.
+            Defaults to None.
 
     Returns:
         A chain that takes in a question and generates a SQL query that answers
@@ -40,7 +46,7 @@ def create_sql_query_generation_chain(
         "initial_context": lambda x: x["initial_context"],
         "tables_content_description": lambda x: x["tables_content_description"],
         "top_k": lambda _: k,
-        "table_info": lambda x: db.get_table_info(
+        "table_info": lambda x: (schema_cache or db).get_table_info(
             table_names=x.get("table_names_to_use")
         ),
     }
@@ -0,0 +1,74 @@
+import sqlalchemy
+
+
+class SQLQueryRejectedError(Exception):
+    """Raised when the plan of a SQL query is estimated to be too expensive."""
+
+
+def get_plan_cost(connection, sql_query):
+    """Return the total cost estimated by the PostgreSQL planner."""
+    plan = connection.execute(
+        sqlalchemy.text(f"EXPLAIN (FORMAT JSON) {sql_query}")
+    ).scalar()
+    return plan[0]["Plan"]["Total Cost"]
+
+
+def format_rows(columns, rows, truncated):
+    """Format the rows compactly for the agent scratchpad."""
+    result = str(tuple(columns)) + "\n" + "\n".join(str(tuple(row)) for row in rows)
+    if truncated:
+        result += f"\n... (truncated after {len(rows)} rows)"
+    return result
+
+
+def run_bounded_sql_query(
+    engine,
+    sql_query,
+    max_plan_cost=1_000_000,
+    statement_timeout_ms=10_000,
+    max_rows=50,
+    max_result_bytes=4_000,
+):
+    """Run a SQL query with a cost check, a statement timeout and a result cap.
+
+    The plan of the query is checked with EXPLAIN first, and queries above
+    max_plan_cost are rejected. The rows are streamed with a server side
+    cursor and the fetching stops after max_rows rows or max_result_bytes
+    bytes of formatted rows.
+    """
+    with engine.connect() as connection:
+        with connection.begin():
+            # SET LOCAL only applies to the current transaction.
+            connection.exec_driver_sql(
+                f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}"
+            )
+
+            plan_cost = get_plan_cost(connection, sql_query)
+            if plan_cost > max_plan_cost:
+                raise SQLQueryRejectedError(
+                    f"The estimated cost {plan_cost} of the query is above"
+                    f" the maximum allowed cost {max_plan_cost}."
+                    " Write a more selective query, for example by filtering"
+                    " with WHERE or aggregating the rows."
+                )
+
+            result = connection.execution_options(
+                stream_results=True, max_row_buffer=max_rows
+            ).execute(sqlalchemy.text(sql_query))
+
+            if not result.returns_rows:
+                return ""
+
+            columns = list(result.keys())
+            rows = []
+            result_bytes = 0
+            truncated = False
+            for row in result:
+                if len(rows) >= max_rows or result_bytes >= max_result_bytes:
+                    truncated = True
+                    break
+                rows.append(row)
+                result_bytes += len(str(tuple(row)))
+            result.close()
+
+            return format_rows(columns, rows, truncated)
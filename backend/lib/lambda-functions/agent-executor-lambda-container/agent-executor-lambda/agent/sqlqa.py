@@ -1,15 +1,31 @@
+import asyncio
+from functools import lru_cache
+
 from langchain.prompts.prompt import PromptTemplate
 
-from .config import AgenticAssistantConfig
+from .config import SQL_SUMMARY_VIEW_NAMES, get_config
+from .schema_cache import SQLSchemaContextCache
+from .sql_cache import TextToSQLCache
 from .sql_chain import create_sql_query_generation_chain
-
-config = AgenticAssistantConfig()
+from .sql_executor import run_bounded_sql_query
 
 sql_tables_content_description = {
     "extracted_entities": (
         "Contains extracted information from multiple financial reports of companies."
         " The information includes revenue, number of employees and risks per company per year."
-    )
+    ),
+    "extracted_entities_by_company": (
+        "Precomputed aggregates of extracted_entities per company and revenue_unit:"
+        " number of reports, first and last year, and the average, minimum, maximum"
+        " and total revenue and average, minimum and maximum number of employees."
+        " Prefer it over aggregating extracted_entities by company."
+    ),
+    "extracted_entities_by_year": (
+        "Precomputed aggregates of extracted_entities per year and revenue_unit:"
+        " number of reports and of companies, and the average, minimum, maximum"
+        " and total revenue and average, minimum and maximum number of employees."
+        " Prefer it over aggregating extracted_entities by year."
+    ),
 }
 
 # ============================================================================
@@ -77,6 +93,26 @@ def prepare_tables_description(table_descriptions):
     return table_description
 
 
+TABLES_CONTENT_DESCRIPTION = prepare_tables_description(
+    sql_tables_content_description
+)
+
+
+@lru_cache(maxsize=None)
+def get_schema_cache():
+    config = get_config()
+    return SQLSchemaContextCache(
+        config.entities_db,
+        config.sql_engine,
+        summary_view_names=SQL_SUMMARY_VIEW_NAMES,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_sql_qa_cache():
+    return TextToSQLCache(max_size=get_config().sql_qa_cache_max_size)
+
+
 def get_text_to_sql_chain(config, llm):
     """Create an LLM chain to convert text input to SQL queries."""
     return create_sql_query_generation_chain(
@@ -85,19 +121,24 @@ def get_text_to_sql_chain(config, llm):
         prompt=LLM_SQL_PROMPT,
         # Value to use with LIMIT clause
         k=5,
+        schema_cache=get_schema_cache(),
     )
 
 
-def get_sql_qa_tool(user_question, text_to_sql_chain, initial_context=""):
-    sql_query = text_to_sql_chain.invoke(
-        {
-            "question": user_question,
-            "initial_context": initial_context,
-            "tables_content_description": prepare_tables_description(
-                sql_tables_content_description
-            ),
-        }
-    )
+def _get_sql_qa_chain_input(user_question, initial_context):
+    return {
+        "question": user_question,
+        "initial_context": initial_context,
+        "tables_content_description": TABLES_CONTENT_DESCRIPTION,
+    }
+
+
+def _run_sql_query(sql_query, table_versions=None):
+    """Return the result of the SQL query and whether the query succeeded.
+
+    When the query fails or is rejected, the result is the error message
+    for the agent.
+    """
     sql_query = sql_query.strip()
 
     # Typically sql queries end with a semicolon ";", some DBs such as SQLite
@@ -107,14 +148,88 @@ def get_sql_qa_tool(user_question, text_to_sql_chain, initial_context=""):
 
     print(sql_query)
 
+    # The results can only be cached when the tables versions are tracked,
+    # otherwise a reload of the tables would not invalidate them.
+    sql_qa_cache = get_sql_qa_cache() if table_versions is not None else None
+    if sql_qa_cache is not None:
+        result = sql_qa_cache.get_result(sql_query, table_versions)
+        if result is not None:
+            return result, True
+
     # fixed_query = sqlfluff.fix(sql=sql_query, dialect="postgres")
+    config = get_config()
     try:
-        result = config.entities_db.run(sql_query)
+        result = run_bounded_sql_query(
+            config.sql_engine,
+            sql_query,
+            max_plan_cost=config.sql_max_plan_cost,
+            statement_timeout_ms=config.sql_statement_timeout_ms,
+            max_rows=config.sql_max_rows,
+            max_result_bytes=config.sql_max_result_bytes,
+        )
     except Exception as e:
-        result = (
+        return (
             f"Failed to run the SQL query {sql_query} with error {e}"
             " Appologize, ask the user for further specifications,"
             " or to try again later."
+        ), False
+
+    if sql_qa_cache is not None:
+        sql_qa_cache.put_result(sql_query, table_versions, result)
+    return result, True
+
+
+def _get_cached_sql_query(user_question, initial_context, table_versions):
+    if table_versions is None:
+        return None
+    return get_sql_qa_cache().get_sql(user_question, initial_context, table_versions)
+
+
+def _cache_sql_query(user_question, initial_context, table_versions, sql_query):
+    if table_versions is not None:
+        get_sql_qa_cache().put_sql(
+            user_question, initial_context, table_versions, sql_query
+        )
+
+
+def get_sql_qa_tool(user_question, text_to_sql_chain, initial_context=""):
+    table_versions = get_schema_cache().get_current_table_versions()
+
+    cached_sql_query = _get_cached_sql_query(
+        user_question, initial_context, table_versions
+    )
+    sql_query = cached_sql_query
+    if sql_query is None:
+        sql_query = text_to_sql_chain.invoke(
+            _get_sql_qa_chain_input(user_question, initial_context)
         )
 
+    result, succeeded = _run_sql_query(sql_query, table_versions)
+    # Only the SQL of the queries that ran is cached, a failed or rejected
+    # query is generated again for the next question.
+    if succeeded and cached_sql_query is None:
+        _cache_sql_query(user_question, initial_context, table_versions, sql_query)
+    return result
+
+
+async def aget_sql_qa_tool(user_question, text_to_sql_chain, initial_context=""):
+    table_versions = await asyncio.to_thread(
+        get_schema_cache().get_current_table_versions
+    )
+
+    cached_sql_query = _get_cached_sql_query(
+        user_question, initial_context, table_versions
+    )
+    sql_query = cached_sql_query
+    if sql_query is None:
+        sql_query = await text_to_sql_chain.ainvoke(
+            _get_sql_qa_chain_input(user_question, initial_context)
+        )
+
+    # psycopg2 is blocking, run the query in a thread to not block the event loop.
+    result, succeeded = await asyncio.to_thread(
+        _run_sql_query, sql_query, table_versions
+    )
+    if succeeded and cached_sql_query is None:
+        _cache_sql_query(user_question, initial_context, table_versions, sql_query)
     return result
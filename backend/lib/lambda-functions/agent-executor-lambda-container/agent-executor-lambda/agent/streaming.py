@@ -0,0 +1,81 @@
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Dict, Iterator, List
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+
+# Marks the end of the token stream in the queue.
+_STREAM_END = object()
+
+
+class TokenQueueCallbackHandler(BaseCallbackHandler):
+    """Push the tokens streamed by the LLM into a queue.
+
+    When final_answer_only is set, the tokens of each LLM call are buffered
+    until the FINAL_ANSWER_PREFIX is generated, and only the tokens after it
+    are pushed. This skips the Thought/Action/Observation steps of the agent.
+    """
+
+    def __init__(self, final_answer_only=False):
+        self.token_queue = queue.Queue()
+        self.final_answer_only = final_answer_only
+        self._generated_text = ""
+        self._final_answer_reached = False
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
+    ) -> None:
+        self._generated_text = ""
+        self._final_answer_reached = False
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if not self.final_answer_only or self._final_answer_reached:
+            self.token_queue.put(token)
+            return
+
+        self._generated_text += token
+        if FINAL_ANSWER_PREFIX in self._generated_text:
+            self._final_answer_reached = True
+            final_answer_start = self._generated_text.split(FINAL_ANSWER_PREFIX, 1)[1]
+            if final_answer_start.strip():
+                self.token_queue.put(final_answer_start.lstrip())
+
+    def end_stream(self):
+        self.token_queue.put(_STREAM_END)
+
+
+def stream_chain_response(
+    chain_callable: Callable[..., str],
+    user_input: str,
+    final_answer_only: bool = False,
+    error_message: str = "",
+) -> Iterator[str]:
+    """Run the chain in a background thread and yield its tokens as they arrive.
+
+    The chain LLM must be created with streaming=True for the tokens to be
+    reported through on_llm_new_token.
+    """
+    callback_handler = TokenQueueCallbackHandler(final_answer_only=final_answer_only)
+
+    def run_chain():
+        try:
+            chain_callable(input=user_input, callbacks=[callback_handler])
+        except Exception:
+            print(traceback.format_exc())
+            callback_handler.token_queue.put(error_message)
+        finally:
+            callback_handler.end_stream()
+
+    thread = threading.Thread(target=run_chain, daemon=True)
+    thread.start()
+
+    while True:
+        token = callback_handler.token_queue.get()
+        if token is _STREAM_END:
+            break
+        yield token
+
+    thread.join()
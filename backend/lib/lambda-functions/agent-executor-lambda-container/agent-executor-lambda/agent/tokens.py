@@ -0,0 +1,11 @@
+# Average number of characters per token of the LLM and embedding models.
+CHARS_PER_TOKEN = 4
+
+
+def approximate_num_tokens(text):
+    """Approximate the number of tokens of a text, ~4 characters per token.
+
+    This avoids loading a tokenizer in the Lambda container, the budget
+    only needs to be approximately respected.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
@@ -1,33 +1,95 @@
+import asyncio
+from functools import lru_cache
+
 import boto3
 from langchain.agents import Tool
-from langchain.llms.bedrock import Bedrock
-from langchain.tools import DuckDuckGoSearchRun
 
 from .calculator import CustomCalculatorTool
-from .config import AgenticAssistantConfig
-from .rag import get_rag_chain
-from .sqlqa import get_sql_qa_tool, get_text_to_sql_chain
-
-config = AgenticAssistantConfig()
-bedrock_runtime = boto3.client("bedrock-runtime", region_name=config.bedrock_region)
-
-claude_llm = Bedrock(
-    model_id=config.llm_model_id,
-    client=bedrock_runtime,
-    model_kwargs={"max_tokens_to_sample": 500, "temperature": 0.0},
-)
-
-# Tools definition
-rag_qa_chain = get_rag_chain(config, claude_llm, bedrock_runtime)
-search = DuckDuckGoSearchRun()
-custom_calculator = CustomCalculatorTool()
+from .config import get_config
+from .profiling import profile_startup
+
+# The tools below are constructed lazily on first use, to avoid paying for
+# the imports and the initialization of the chains on requests that do not
+# use them, e.g., requests to the basic chatbot.
+
+
+@lru_cache(maxsize=None)
+def get_bedrock_runtime():
+    with profile_startup("tools.bedrock_runtime"):
+        return boto3.client(
+            "bedrock-runtime", region_name=get_config().bedrock_region
+        )
+
+
+@lru_cache(maxsize=None)
+def get_claude_llm():
+    with profile_startup("langchain.llms.bedrock", kind="import"):
+        from langchain.llms.bedrock import Bedrock
+
+    with profile_startup("tools.claude_llm"):
+        return Bedrock(
+            model_id=get_config().llm_model_id,
+            client=get_bedrock_runtime(),
+            model_kwargs={"max_tokens_to_sample": 500, "temperature": 0.0},
+        )
+
+
+@lru_cache(maxsize=None)
+def get_rag_qa_chain():
+    with profile_startup("agent.rag", kind="import"):
+        from .rag import get_rag_chain
+
+    with profile_startup("tools.rag_qa_chain"):
+        return get_rag_chain(get_config(), get_claude_llm(), get_bedrock_runtime())
+
+
+@lru_cache(maxsize=None)
+def get_text_to_sql_chain():
+    with profile_startup("agent.sqlqa", kind="import"):
+        from .sqlqa import get_text_to_sql_chain as _get_text_to_sql_chain
+
+    with profile_startup("tools.text_to_sql_chain"):
+        return _get_text_to_sql_chain(get_config(), get_claude_llm())
+
 
-TEXT_TO_SQL_CHAIN = get_text_to_sql_chain(config, claude_llm)
+@lru_cache(maxsize=None)
+def get_search():
+    with profile_startup("langchain.tools.DuckDuckGoSearchRun", kind="import"):
+        from langchain.tools import DuckDuckGoSearchRun
+
+    with profile_startup("tools.search"):
+        return DuckDuckGoSearchRun()
+
+
+def run_sql_qa_tool(question):
+    from .sqlqa import get_sql_qa_tool
+
+    return get_sql_qa_tool(question, get_text_to_sql_chain())
+
+
+async def arun_sql_qa_tool(question):
+    from .sqlqa import aget_sql_qa_tool
+
+    return await aget_sql_qa_tool(question, get_text_to_sql_chain())
+
+
+# The Bedrock and PostgreSQL clients (boto3, psycopg2) and the search client
+# are blocking, their async versions run them in a thread to overlap their I/O.
+async def arun_rag_qa_chain(query):
+    return await asyncio.to_thread(get_rag_qa_chain(), {"question": query})
+
+
+async def arun_search(query):
+    return await asyncio.to_thread(get_search().run, query)
+
+
+custom_calculator = CustomCalculatorTool()
 
 LLM_AGENT_TOOLS = [
     Tool(
         name="SemanticSearch",
-        func=lambda query: rag_qa_chain({"question": query}),
+        func=lambda query: get_rag_qa_chain()({"question": query}),
+        coroutine=arun_rag_qa_chain,
         description=(
             "Use when you are asked questions about financial reports of companies."
             " The Input should be a correctly formatted question."
@@ -35,7 +97,8 @@ LLM_AGENT_TOOLS = [
     ),
     Tool(
         name="SQLQA",
-        func=lambda question: get_sql_qa_tool(question, TEXT_TO_SQL_CHAIN),
+        func=run_sql_qa_tool,
+        coroutine=arun_sql_qa_tool,
         description=(
             "Use when you are asked analytical questions about financial reports of companies."
             " For example, when asked to give the average or maximum revenue of a company, etc."
@@ -44,7 +107,8 @@ LLM_AGENT_TOOLS = [
     ),
     Tool(
         name="Search",
-        func=search.run,
+        func=lambda query: get_search().run(query),
+        coroutine=arun_search,
         description=(
             "Use when you need to answer questions about current events, news or people."
             " You should ask targeted questions."
@@ -53,6 +117,7 @@ LLM_AGENT_TOOLS = [
     Tool(
         name="Calculator",
         func=custom_calculator,
+        coroutine=custom_calculator.arun,
         description=(
             "Always Use this tool when you need to answer math questions."
             " The input to Calculator can only be an valid math expression, such as 55/3."
@@ -1,89 +1,160 @@
+import asyncio
+import json
 import logging
+import time
 import traceback
 
-import boto3
-from langchain.agents import AgentExecutor, ZeroShotAgent
-from langchain.chains import ConversationChain, LLMChain
-from langchain.llms.bedrock import Bedrock
-from langchain.memory import ConversationBufferMemory
-from langchain.memory.chat_message_histories import DynamoDBChatMessageHistory
+from agent.profiling import emit_startup_profile, profile_startup
 
-from agent.config import AgenticAssistantConfig
-from agent.prompts import CALUDE_AGENT_PROMPT, CLAUDE_PROMPT
-from agent.tools import LLM_AGENT_TOOLS
+with profile_startup("boto3", kind="import"):
+    import boto3
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+with profile_startup("langchain", kind="import"):
+    from langchain.agents import AgentExecutor, ZeroShotAgent
+    from langchain.chains import ConversationChain, LLMChain
+    from langchain.llms.bedrock import Bedrock
 
-ssm = boto3.client("ssm")
-config = AgenticAssistantConfig()
+with profile_startup("agent", kind="import"):
+    from agent.chat_history import DynamoDBTurnChatMessageHistory
+    from agent.config import get_config
+    from agent.db import POOL_METRICS
+    from agent.memory import DynamoDBSessionSummaryStore, SummaryWindowChatMemory
+    from agent.parallel_actions import (
+        ParallelActionsOutputParser,
+        get_parallel_actions_tool,
+    )
+    from agent.prompts import CALUDE_AGENT_PROMPT, CLAUDE_PROMPT
+    from agent.streaming import stream_chain_response
+    from agent.tools import LLM_AGENT_TOOLS
 
-bedrock_runtime = boto3.client("bedrock-runtime", region_name=config.bedrock_region)
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
 
-claude_llm = Bedrock(
-    model_id=config.llm_model_id,
-    client=bedrock_runtime,
-    model_kwargs={"max_tokens_to_sample": 500, "temperature": 0.0},
+INTERNAL_ERROR_RESPONSE = (
+    "Unable to respond due to an internal issue." " Please try again later"
 )
 
+with profile_startup("config"):
+    config = get_config()
 
-def get_basic_chatbot_conversation_chain(
-    user_input, session_id, clean_history, verbose=True
-):
-    message_history = DynamoDBChatMessageHistory(
-        table_name=config.chat_message_history_table_name, session_id=session_id
+with profile_startup("claude_llm"):
+    bedrock_runtime = boto3.client(
+        "bedrock-runtime", region_name=config.bedrock_region
     )
 
-    if clean_history:
-        message_history.clear()
-
-    memory = ConversationBufferMemory(
-        memory_key="history",
-        chat_memory=message_history,
-        ai_prefix="AI",
-        # Change the human_prefix from Human to something else
-        # to not conflict with Human keyword in Anthropic Claude model.
-        human_prefix="Hu",
-        return_messages=False,
+    claude_llm = Bedrock(
+        model_id=config.llm_model_id,
+        client=bedrock_runtime,
+        model_kwargs={"max_tokens_to_sample": 500, "temperature": 0.0},
     )
 
-    conversation_chain = ConversationChain(
-        prompt=CLAUDE_PROMPT, llm=claude_llm, verbose=verbose, memory=memory
+    # Uses invoke_model_with_response_stream and reports the tokens to the
+    # callbacks, only used by the chains of the streamed and async responses.
+    claude_streaming_llm = Bedrock(
+        model_id=config.llm_model_id,
+        client=bedrock_runtime,
+        model_kwargs={"max_tokens_to_sample": 500, "temperature": 0.0},
+        streaming=True,
     )
 
-    return conversation_chain
 
+# Registry of the session independent parts of the agentic chain, the
+# ZeroShotAgent with its LLMChain and the tools. They are built once per warm
+# container and a new executor is built around them per request, with the
+# session bound memory. The executor is not copied since the pydantic copy
+# leaves out its excluded fields, such as the callbacks.
+_AGENT_REGISTRY = {}
 
-def get_agentic_chatbot_conversation_chain(
-    user_input, session_id, clean_history, verbose=True
-):
-    message_history = DynamoDBChatMessageHistory(
-        table_name=config.chat_message_history_table_name, session_id=session_id
+
+def _get_memory(memory_key, session_id, clean_history):
+    message_history = DynamoDBTurnChatMessageHistory(
+        table_name=config.chat_message_history_table_name,
+        session_id=session_id,
+        # Read one more turn than the memory window, it may still need
+        # to be folded into the running summary.
+        max_turns=config.chat_history_max_turns + 1,
+        ttl_seconds=config.chat_history_ttl_seconds,
     )
-    if clean_history:
-        message_history.clear()
 
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
+    memory = SummaryWindowChatMemory(
+        llm=claude_llm,
+        summary_store=DynamoDBSessionSummaryStore(
+            config.chat_message_history_table_name,
+            session_id,
+            ttl_seconds=config.chat_history_ttl_seconds,
+        ),
+        memory_key=memory_key,
         chat_memory=message_history,
         ai_prefix="AI",
-        # change the human_prefix from Human to something else
+        # Change the human_prefix from Human to something else
         # to not conflict with Human keyword in Anthropic Claude model.
         human_prefix="Hu",
         return_messages=False,
+        max_turns=config.chat_history_max_turns,
+        max_token_limit=config.chat_history_max_tokens,
+        summary_batch_turns=config.chat_history_summary_batch_turns,
     )
 
-    llm_chain = LLMChain(llm=claude_llm, prompt=CALUDE_AGENT_PROMPT)
+    if clean_history:
+        memory.clear()
+
+    return memory
+
+
+def _get_llm(streaming):
+    return claude_streaming_llm if streaming else claude_llm
+
+
+def _build_agent(verbose=True, streaming=False):
+    llm_chain = LLMChain(llm=_get_llm(streaming), prompt=CALUDE_AGENT_PROMPT)
 
     agent = ZeroShotAgent(
         llm_chain=llm_chain,
         tools=LLM_AGENT_TOOLS,
         verbose=verbose,
+        # Groups independent actions of the same step to run them concurrently.
+        output_parser=ParallelActionsOutputParser(),
     )
+    tools = LLM_AGENT_TOOLS + [get_parallel_actions_tool(LLM_AGENT_TOOLS)]
+
+    return agent, tools
+
+
+def get_registered_agent(verbose=True, streaming=False):
+    """Return the cached session independent agent and tools."""
+    key = (verbose, streaming)
+    if key not in _AGENT_REGISTRY:
+        with profile_startup("agentic_chain"):
+            _AGENT_REGISTRY[key] = _build_agent(verbose=verbose, streaming=streaming)
+    return _AGENT_REGISTRY[key]
+
+
+def get_basic_chatbot_conversation_chain(
+    user_input, session_id, clean_history, verbose=True, streaming=False
+):
+    memory = _get_memory("history", session_id, clean_history)
+
+    # The prompt and the llm are shared by all the requests of the container.
+    conversation_chain = ConversationChain(
+        prompt=CLAUDE_PROMPT,
+        llm=_get_llm(streaming),
+        verbose=verbose,
+        memory=memory,
+    )
+
+    return conversation_chain
+
+
+def get_agentic_chatbot_conversation_chain(
+    user_input, session_id, clean_history, verbose=True, streaming=False
+):
+    memory = _get_memory("chat_history", session_id, clean_history)
+
+    agent, tools = get_registered_agent(verbose, streaming)
 
     agent_chain = AgentExecutor.from_agent_and_tools(
         agent=agent,
-        tools=LLM_AGENT_TOOLS,
+        tools=tools,
         verbose=verbose,
         memory=memory,
         handle_parsing_errors="Check your output and make sure it conforms!",
@@ -91,39 +162,133 @@ def get_agentic_chatbot_conversation_chain(
     return agent_chain
 
 
+# The sync and async methods running each conversation chain.
+_CHAIN_RUN_METHODS = {
+    "basic": ("predict", "apredict"),
+    "agentic": ("run", "arun"),
+}
+
+
+def get_conversation_chain(
+    chatbot_type, user_input, session_id, clean_history, streaming=False
+):
+    """Return the conversation chain of the chatbot type bound to the session."""
+    setup_start_time = time.perf_counter()
+    if chatbot_type == "basic":
+        conversation_chain = get_basic_chatbot_conversation_chain(
+            user_input, session_id, clean_history, streaming=streaming
+        )
+    elif chatbot_type == "agentic":
+        conversation_chain = get_agentic_chatbot_conversation_chain(
+            user_input, session_id, clean_history, streaming=streaming
+        )
+    else:
+        return None
+    logger.info(
+        f"Chain setup for chatbot_type {chatbot_type} took"
+        f" {(time.perf_counter() - setup_start_time) * 1000:.2f} ms"
+    )
+    return conversation_chain
+
+
+async def arun_conversation_chain(conversation_chain, chatbot_type, user_input):
+    """Run the chain with the async tools, overlapping the chat history reads."""
+    await conversation_chain.memory.aprefetch()
+    arun = getattr(conversation_chain, _CHAIN_RUN_METHODS[chatbot_type][1])
+    return await arun(input=user_input)
+
+
+def stream_response(conversation_chain, chatbot_type, user_input):
+    """Yield the response tokens as they are generated by the LLM.
+
+    For the agentic chatbot only the tokens of the final answer are yielded.
+    """
+    request_start_time = time.perf_counter()
+    first_token_logged = False
+    for token in stream_chain_response(
+        conversation_chain,
+        user_input,
+        final_answer_only=chatbot_type == "agentic",
+        error_message=INTERNAL_ERROR_RESPONSE,
+    ):
+        if not first_token_logged:
+            logger.info(
+                "Time to first token"
+                f" {(time.perf_counter() - request_start_time) * 1000:.2f} ms"
+            )
+            first_token_logged = True
+        yield token
+
+
+def get_unsupported_chatbot_type_response(chatbot_type):
+    return (
+        f"The chatbot_type {chatbot_type} is not supported."
+        f" Please use one of the following types: {list(_CHAIN_RUN_METHODS)}"
+    )
+
+
+def stream_event_response(event):
+    """Yield the response to the event as it is generated.
+
+    The Python Lambda runtime returns the response once lambda_handler returns,
+    streaming_server.py serves this stream through the Lambda Web Adapter.
+    """
+    logger.info(event)
+    user_input = event["user_input"]
+    chatbot_type = event.get("chatbot_type", "basic")
+
+    conversation_chain = get_conversation_chain(
+        chatbot_type,
+        user_input,
+        event["session_id"],
+        event.get("clean_history", False),
+        streaming=True,
+    )
+    if conversation_chain is None:
+        yield get_unsupported_chatbot_type_response(chatbot_type)
+        return
+
+    run = getattr(conversation_chain, _CHAIN_RUN_METHODS[chatbot_type][0])
+    yield from stream_response(run, chatbot_type, user_input)
+
+    emit_startup_profile(logger, chatbot_type)
+    logger.info(json.dumps({"event": "db_pool_metrics", **POOL_METRICS.snapshot()}))
+
+
 def lambda_handler(event, context):
     logger.info(event)
     user_input = event["user_input"]
     session_id = event["session_id"]
     chatbot_type = event.get("chatbot_type", "basic")
-    chatbot_types = ["basic", "agentic"]
     clean_history = event.get("clean_history", False)
+    # Run the chain and the tools with asyncio, to overlap their I/O.
+    use_async = event.get("use_async", False)
 
-    if chatbot_type == "basic":
-        conversation_chain = get_basic_chatbot_conversation_chain(
-            user_input, session_id, clean_history
-        ).predict
-    elif chatbot_type == "agentic":
-        conversation_chain = get_agentic_chatbot_conversation_chain(
-            user_input, session_id, clean_history
-        ).run
-    else:
+    # The async calls of the Bedrock LLM are only implemented with streaming.
+    conversation_chain = get_conversation_chain(
+        chatbot_type, user_input, session_id, clean_history, streaming=use_async
+    )
+    if conversation_chain is None:
         return {
             "statusCode": 200,
-            "response": (
-                f"The chatbot_type {chatbot_type} is not supported."
-                f" Please use one of the following types: {chatbot_types}"
-            )
+            "response": get_unsupported_chatbot_type_response(chatbot_type),
         }
 
     try:
-        response = conversation_chain(input=user_input)
+        if use_async:
+            response = asyncio.run(
+                arun_conversation_chain(conversation_chain, chatbot_type, user_input)
+            )
+        else:
+            run = getattr(conversation_chain, _CHAIN_RUN_METHODS[chatbot_type][0])
+            response = run(input=user_input)
     except Exception:
-        response = (
-            "Unable to respond due to an internal issue." " Please try again later"
-        )
+        response = INTERNAL_ERROR_RESPONSE
         print(traceback.format_exc())
 
+    emit_startup_profile(logger, chatbot_type)
+    logger.info(json.dumps({"event": "db_pool_metrics", **POOL_METRICS.snapshot()}))
+
     return {
         "statusCode": 200,
         "response": response
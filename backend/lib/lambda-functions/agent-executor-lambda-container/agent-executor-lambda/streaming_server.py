@@ -0,0 +1,69 @@
+"""Serve the chatbot responses as they are generated, behind the Lambda Web Adapter.
+
+The streaming stage of the Dockerfile runs this server instead of the Lambda
+runtime. The Lambda Web Adapter extension forwards the function URL requests
+to it and, with the response_stream invoke mode, streams back the chunks of
+the response while they are written.
+
+Run it locally with: python streaming_server.py, then
+curl -N -d '{"user_input": "Hi", "session_id": "1"}' localhost:8080
+"""
+import json
+import os
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from handler import INTERNAL_ERROR_RESPONSE, stream_event_response
+
+PORT = int(os.environ.get("AWS_LWA_PORT", "8080"))
+HEALTH_CHECK_PATH = os.environ.get("AWS_LWA_READINESS_CHECK_PATH", "/health")
+
+
+class StreamingRequestHandler(BaseHTTPRequestHandler):
+    # The chunked transfer encoding requires HTTP/1.1.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != HEALTH_CHECK_PATH:
+            self._send_text(404, "Not found")
+            return
+        self._send_text(200, "OK")
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        try:
+            event = json.loads(self.rfile.read(content_length))
+        except ValueError:
+            self._send_text(400, "The request body must be a JSON object.")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            for token in stream_event_response(event):
+                # An empty chunk would end the response.
+                if token:
+                    self._write_chunk(token.encode("utf-8"))
+        except Exception:
+            print(traceback.format_exc())
+            self._write_chunk(INTERNAL_ERROR_RESPONSE.encode("utf-8"))
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_text(self, status_code, text):
+        body = text.encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == "__main__":
+    ThreadingHTTPServer(("", PORT), StreamingRequestHandler).serve_forever()
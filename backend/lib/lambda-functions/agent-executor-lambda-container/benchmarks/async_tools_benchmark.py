@@ -0,0 +1,168 @@
+"""Show the overlap of the agent I/O with the async tools and handler path.
+
+The Bedrock, PostgreSQL, search and DynamoDB clients are replaced by fakes
+blocking for a simulated latency, like the real blocking clients do. The
+benchmark compares running the actions of one agent step one after the other,
+with the ParallelActions tool on the sync path (thread pool) and on the async
+path (asyncio.gather of the tool coroutines), and the chat history and running
+summary reads done sequentially or with SummaryWindowChatMemory.aprefetch.
+
+Usage: AWS_DEFAULT_REGION=us-east-1 python benchmarks/async_tools_benchmark.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "agent-executor-lambda")
+)
+
+from langchain.llms.fake import FakeListLLM  # noqa: E402
+from langchain.schema import BaseChatMessageHistory  # noqa: E402
+
+from agent import sqlqa, tools  # noqa: E402
+from agent.memory import SummaryWindowChatMemory  # noqa: E402
+from agent.parallel_actions import get_parallel_actions_tool  # noqa: E402
+
+ACTIONS = [
+    {"tool": "SemanticSearch", "tool_input": "What was the revenue of Amazon?"},
+    {"tool": "SQLQA", "tool_input": "What is the average revenue per year?"},
+    {"tool": "Search", "tool_input": "Who is the CEO of Amazon?"},
+]
+
+
+class FakeRAGChain:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def __call__(self, inputs):
+        time.sleep(self.latency)
+        return {"answer": "42", "sources": ""}
+
+
+class FakeSearch:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def run(self, query):
+        time.sleep(self.latency)
+        return "42"
+
+
+class FakeChatHistory(BaseChatMessageHistory):
+    first_message_index = 0
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    @property
+    def messages(self):  # type: ignore
+        time.sleep(self.latency)
+        return []
+
+    def add_message(self, message):
+        pass
+
+    def clear(self):
+        pass
+
+
+class FakeSummaryStore:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def load(self):
+        time.sleep(self.latency)
+        return "", 0
+
+
+def fake_tools(latency):
+    """Replace the clients used by the agent tools with simulated latency."""
+
+    def get_sql_qa_tool(question, text_to_sql_chain):
+        time.sleep(latency)
+        return "42"
+
+    async def aget_sql_qa_tool(question, text_to_sql_chain):
+        await asyncio.to_thread(time.sleep, latency)
+        return "42"
+
+    return [
+        mock.patch.object(tools, "get_rag_qa_chain", lambda: FakeRAGChain(latency)),
+        mock.patch.object(tools, "get_search", lambda: FakeSearch(latency)),
+        mock.patch.object(tools, "get_text_to_sql_chain", lambda: None),
+        mock.patch.object(sqlqa, "get_sql_qa_tool", get_sql_qa_tool),
+        mock.patch.object(sqlqa, "aget_sql_qa_tool", aget_sql_qa_tool),
+    ]
+
+
+def get_memory(latency):
+    return SummaryWindowChatMemory(
+        llm=FakeListLLM(responses=["summary"]),
+        summary_store=FakeSummaryStore(latency),
+        chat_memory=FakeChatHistory(latency),
+    )
+
+
+def time_ms(run):
+    start_time = time.perf_counter()
+    run()
+    return (time.perf_counter() - start_time) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=200,
+        help="Simulated latency of each Bedrock, PostgreSQL or DynamoDB call.",
+    )
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    tools_by_name = {tool.name: tool for tool in tools.LLM_AGENT_TOOLS}
+    parallel_actions_tool = get_parallel_actions_tool(tools.LLM_AGENT_TOOLS)
+    tool_input = json.dumps(ACTIONS)
+
+    def run_memory_sequentially():
+        memory = get_memory(latency)
+        memory.chat_memory.messages
+        memory._load_summary()
+
+    def run_memory_prefetch():
+        asyncio.run(get_memory(latency).aprefetch())
+
+    variants = {
+        f"{len(ACTIONS)} actions, sequential": lambda: [
+            tools_by_name[action["tool"]].run(action["tool_input"])
+            for action in ACTIONS
+        ],
+        f"{len(ACTIONS)} actions, ParallelActions sync": lambda: (
+            parallel_actions_tool.run(tool_input)
+        ),
+        f"{len(ACTIONS)} actions, ParallelActions async": lambda: asyncio.run(
+            parallel_actions_tool.arun(tool_input)
+        ),
+        "memory reads, sequential": run_memory_sequentially,
+        "memory reads, aprefetch": run_memory_prefetch,
+    }
+
+    patches = fake_tools(latency)
+    for patch in patches:
+        patch.start()
+    try:
+        print(f"Simulated latency per call: {args.latency_ms:.0f} ms")
+        for name, run in variants.items():
+            print(f"{name:<40}{time_ms(run):>10.1f} ms")
+    finally:
+        for patch in patches:
+            patch.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare the per-request cost of building and running the conversation chains.
+
+"before" builds the LLMChain, the ZeroShotAgent and the AgentExecutor on every
+request, "after" builds the AgentExecutor around the agent and tools built once
+per container, as done by get_registered_agent in handler.py. Each request runs
+the chain once, the LLM and the chat history are in-memory fakes.
+
+Usage: AWS_DEFAULT_REGION=us-east-1 python benchmarks/chain_setup_benchmark.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "agent-executor-lambda")
+)
+
+from langchain.agents import AgentExecutor, ZeroShotAgent  # noqa: E402
+from langchain.chains import ConversationChain, LLMChain  # noqa: E402
+from langchain.llms.fake import FakeListLLM  # noqa: E402
+from langchain.memory import ChatMessageHistory, ConversationBufferMemory  # noqa: E402
+
+from agent.parallel_actions import (  # noqa: E402
+    ParallelActionsOutputParser,
+    get_parallel_actions_tool,
+)
+from agent.prompts import CALUDE_AGENT_PROMPT, CLAUDE_PROMPT  # noqa: E402
+from agent.tools import LLM_AGENT_TOOLS  # noqa: E402
+
+llm = FakeListLLM(responses=["Final Answer: ok"])
+
+
+def get_memory(memory_key):
+    return ConversationBufferMemory(
+        memory_key=memory_key,
+        chat_memory=ChatMessageHistory(),
+        ai_prefix="AI",
+        human_prefix="Hu",
+    )
+
+
+def build_agent():
+    agent = ZeroShotAgent(
+        llm_chain=LLMChain(llm=llm, prompt=CALUDE_AGENT_PROMPT),
+        tools=LLM_AGENT_TOOLS,
+        output_parser=ParallelActionsOutputParser(),
+    )
+    tools = LLM_AGENT_TOOLS + [get_parallel_actions_tool(LLM_AGENT_TOOLS)]
+    return agent, tools
+
+
+def build_agent_executor(agent, tools):
+    return AgentExecutor.from_agent_and_tools(
+        agent=agent,
+        tools=tools,
+        memory=get_memory("chat_history"),
+        handle_parsing_errors="Check your output and make sure it conforms!",
+    )
+
+
+def run_basic_request():
+    conversation_chain = ConversationChain(
+        prompt=CLAUDE_PROMPT, llm=llm, memory=get_memory("history")
+    )
+    return conversation_chain.predict(input="Hi")
+
+
+def run_agentic_request_before():
+    return build_agent_executor(*build_agent()).run(input="Hi")
+
+
+def run_agentic_request_after(registered_agent):
+    return build_agent_executor(*registered_agent).run(input="Hi")
+
+
+def time_requests(run_request, num_requests):
+    timings_ms = []
+    for _ in range(num_requests):
+        start_time = time.perf_counter()
+        run_request()
+        timings_ms.append((time.perf_counter() - start_time) * 1000)
+    return timings_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-requests", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'chatbot_type':<14}{'variant':<9}{'p50 ms':>10}{'p95 ms':>10}")
+    registered_agent = build_agent()
+    # The basic chain has no session independent part worth caching, the
+    # prompt and the llm are module level objects in both variants.
+    benchmarks = [
+        ("basic", "before", run_basic_request),
+        ("basic", "after", run_basic_request),
+        ("agentic", "before", run_agentic_request_before),
+        ("agentic", "after", lambda: run_agentic_request_after(registered_agent)),
+    ]
+    for chatbot_type, variant, run_request in benchmarks:
+        timings_ms = sorted(time_requests(run_request, args.num_requests))
+        p95_ms = timings_ms[int(0.95 * (len(timings_ms) - 1))]
+        print(
+            f"{chatbot_type:<14}{variant:<9}"
+            f"{statistics.median(timings_ms):>10.3f}{p95_ms:>10.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
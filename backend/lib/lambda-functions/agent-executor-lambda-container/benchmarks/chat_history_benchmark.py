@@ -0,0 +1,156 @@
+"""Compare the chat history reads and writes per request on a local DynamoDB.
+
+"before" is the langchain DynamoDBChatMessageHistory storing the whole session
+in one item, "after" is DynamoDBTurnChatMessageHistory storing one compressed
+item per turn and reading only the most recent turns. For sessions of
+10, 100 and 1000 turns the benchmark times one request, i.e., reading the
+history and adding a turn, and reports the size of the items of the session.
+The single item of the "before" history stops growing at the 400 KB item size
+limit of DynamoDB, the requests failing on it are counted as errors.
+
+Start DynamoDB Local first, e.g.:
+    docker run -p 8000:8000 amazon/dynamodb-local
+Usage:
+    AWS_DEFAULT_REGION=us-east-1 AWS_ACCESS_KEY_ID=local \\
+    AWS_SECRET_ACCESS_KEY=local python benchmarks/chat_history_benchmark.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "agent-executor-lambda")
+)
+
+import boto3  # noqa: E402
+from boto3.dynamodb.conditions import Key  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+from langchain.schema import AIMessage, HumanMessage  # noqa: E402
+from langchain_community.chat_message_histories import (  # noqa: E402
+    DynamoDBChatMessageHistory,
+)
+
+from agent.chat_history import DynamoDBTurnChatMessageHistory  # noqa: E402
+
+SESSION_TURNS = [10, 100, 1000]
+# Same number of turns read as the handler, chat_history_max_turns + 1.
+MAX_TURNS = 6
+
+QUESTION = "What was the revenue of the company in the last fiscal year?"
+ANSWER = (
+    "The revenue of the company in the last fiscal year was 12.3 billion"
+    " dollars, up 8% from the previous year according to the annual report."
+)
+
+
+def create_table(dynamodb, table_name, with_turn):
+    key_schema = [{"AttributeName": "SessionId", "KeyType": "HASH"}]
+    attributes = [{"AttributeName": "SessionId", "AttributeType": "S"}]
+    if with_turn:
+        key_schema.append({"AttributeName": "Turn", "KeyType": "RANGE"})
+        attributes.append({"AttributeName": "Turn", "AttributeType": "N"})
+    table = dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=key_schema,
+        AttributeDefinitions=attributes,
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.wait_until_exists()
+    return table
+
+
+def get_histories(before_table, after_table, session_id, endpoint_url):
+    return {
+        "before": DynamoDBChatMessageHistory(
+            before_table.name, session_id, endpoint_url=endpoint_url
+        ),
+        "after": DynamoDBTurnChatMessageHistory(
+            after_table.name,
+            session_id,
+            max_turns=MAX_TURNS,
+            endpoint_url=endpoint_url,
+        ),
+    }
+
+
+def run_request(history):
+    """Read the history and add a turn, return whether the writes succeeded."""
+    history.messages
+    try:
+        history.add_message(HumanMessage(content=QUESTION))
+        history.add_message(AIMessage(content=ANSWER))
+    except ClientError:
+        return False
+    return True
+
+
+def get_session_size(table, session_id):
+    """Return the approximate size in bytes of the items of the session."""
+    response = table.query(
+        KeyConditionExpression=Key("SessionId").eq(session_id),
+        ConsistentRead=True,
+        ReturnConsumedCapacity="TOTAL",
+    )
+    # A read capacity unit covers up to 4 KB with a strongly consistent read.
+    return int(response["ConsumedCapacity"]["CapacityUnits"] * 4096)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoint-url", default="http://localhost:8000")
+    parser.add_argument("--num-requests", type=int, default=20)
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource("dynamodb", endpoint_url=args.endpoint_url)
+    suffix = uuid.uuid4().hex[:8]
+    before_table = create_table(dynamodb, f"chat-history-before-{suffix}", False)
+    after_table = create_table(dynamodb, f"chat-history-after-{suffix}", True)
+
+    print(
+        f"{'turns':>6} {'variant':<8}{'p50 ms':>10}{'p95 ms':>10}{'KB':>10}"
+        f"{'errors':>8}"
+    )
+    try:
+        for num_turns in SESSION_TURNS:
+            session_id = f"session-{num_turns}"
+            # Fill the sessions without timing, one turn at a time.
+            for _ in range(num_turns):
+                for history in get_histories(
+                    before_table, after_table, session_id, args.endpoint_url
+                ).values():
+                    run_request(history)
+
+            timings_ms = {"before": [], "after": []}
+            num_errors = {"before": 0, "after": 0}
+            for _ in range(args.num_requests):
+                histories = get_histories(
+                    before_table, after_table, session_id, args.endpoint_url
+                )
+                for variant, history in histories.items():
+                    start_time = time.perf_counter()
+                    if not run_request(history):
+                        num_errors[variant] += 1
+                    timings_ms[variant].append(
+                        (time.perf_counter() - start_time) * 1000
+                    )
+
+            tables = {"before": before_table, "after": after_table}
+            for variant, variant_timings_ms in timings_ms.items():
+                variant_timings_ms.sort()
+                p95_ms = variant_timings_ms[int(0.95 * (len(variant_timings_ms) - 1))]
+                size_kb = get_session_size(tables[variant], session_id) / 1024
+                print(
+                    f"{num_turns:>6} {variant:<8}"
+                    f"{statistics.median(variant_timings_ms):>10.2f}"
+                    f"{p95_ms:>10.2f}{size_kb:>10.1f}{num_errors[variant]:>8}"
+                )
+    finally:
+        before_table.delete()
+        after_table.delete()
+
+
+if __name__ == "__main__":
+    main()
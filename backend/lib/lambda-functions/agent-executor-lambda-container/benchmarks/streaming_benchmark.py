@@ -0,0 +1,129 @@
+"""Compare the time to the first response token with and without streaming.
+
+The Bedrock client is a fake generating each token after a fixed delay, through
+invoke_model for the non-streamed responses and invoke_model_with_response_stream
+for the streamed ones, as consumed by stream_chain_response in agent/streaming.py.
+The agentic chatbot generates a thought before its final answer, which is left
+out of the stream by the final answer filter.
+
+Usage: AWS_DEFAULT_REGION=us-east-1 python benchmarks/streaming_benchmark.py
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "agent-executor-lambda")
+)
+
+from langchain.agents import AgentExecutor, ZeroShotAgent  # noqa: E402
+from langchain.chains import ConversationChain, LLMChain  # noqa: E402
+from langchain.llms.bedrock import Bedrock  # noqa: E402
+from langchain.memory import ConversationBufferMemory  # noqa: E402
+
+from agent.parallel_actions import ParallelActionsOutputParser  # noqa: E402
+from agent.prompts import CALUDE_AGENT_PROMPT, CLAUDE_PROMPT  # noqa: E402
+from agent.streaming import stream_chain_response  # noqa: E402
+
+ANSWER = " ".join(["word"] * 40)
+
+COMPLETIONS = {
+    "basic": ANSWER,
+    "agentic": (
+        "Thought: I can answer without the tools, the question is about"
+        f" the conversation.\nFinal Answer: {ANSWER}"
+    ),
+}
+
+
+class FakeBedrockRuntime:
+    """Generate the completion word by word, after a delay per token."""
+
+    def __init__(self, completion, token_delay_seconds):
+        self.tokens = [f"{word} " for word in completion.split(" ")]
+        self.token_delay_seconds = token_delay_seconds
+
+    def invoke_model(self, **kwargs):
+        time.sleep(self.token_delay_seconds * len(self.tokens))
+        body = json.dumps({"completion": "".join(self.tokens)}).encode()
+        return {"body": io.BytesIO(body)}
+
+    def invoke_model_with_response_stream(self, **kwargs):
+        return {"body": self._generate_events()}
+
+    def _generate_events(self):
+        for token in self.tokens:
+            time.sleep(self.token_delay_seconds)
+            yield {"chunk": {"bytes": json.dumps({"completion": token}).encode()}}
+
+
+def build_chain_run(chatbot_type, client, streaming):
+    llm = Bedrock(model_id="anthropic.claude-v2", client=client, streaming=streaming)
+    if chatbot_type == "basic":
+        return ConversationChain(
+            prompt=CLAUDE_PROMPT,
+            llm=llm,
+            memory=ConversationBufferMemory(memory_key="history", human_prefix="Hu"),
+        ).predict
+
+    agent = ZeroShotAgent(
+        llm_chain=LLMChain(llm=llm, prompt=CALUDE_AGENT_PROMPT),
+        tools=[],
+        output_parser=ParallelActionsOutputParser(),
+    )
+    return AgentExecutor.from_agent_and_tools(
+        agent=agent,
+        tools=[],
+        memory=ConversationBufferMemory(memory_key="chat_history", human_prefix="Hu"),
+    ).run
+
+
+def time_request(chatbot_type, client, streaming):
+    """Return the time to the first response token and the total time in ms."""
+    chain_run = build_chain_run(chatbot_type, client, streaming)
+    start_time = time.perf_counter()
+    if not streaming:
+        chain_run(input="Hi")
+        total_ms = (time.perf_counter() - start_time) * 1000
+        return total_ms, total_ms
+
+    first_token_ms = None
+    for _ in stream_chain_response(
+        chain_run, "Hi", final_answer_only=chatbot_type == "agentic"
+    ):
+        if first_token_ms is None:
+            first_token_ms = (time.perf_counter() - start_time) * 1000
+    return first_token_ms, (time.perf_counter() - start_time) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-requests", type=int, default=5)
+    parser.add_argument("--token-delay-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'chatbot_type':<14}{'variant':<12}"
+        f"{'first token ms':>16}{'total ms':>12}"
+    )
+    for chatbot_type, completion in COMPLETIONS.items():
+        client = FakeBedrockRuntime(completion, args.token_delay_ms / 1000)
+        for variant, streaming in [("sync", False), ("streaming", True)]:
+            timings_ms = [
+                time_request(chatbot_type, client, streaming)
+                for _ in range(args.num_requests)
+            ]
+            first_token_ms, total_ms = zip(*timings_ms)
+            print(
+                f"{chatbot_type:<14}{variant:<12}"
+                f"{statistics.median(first_token_ms):>16.1f}"
+                f"{statistics.median(total_ms):>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import glob
+import hashlib
+import io
 import json
 import os
 
@@ -21,6 +24,13 @@ username = database_secrets['username']
 password = database_secrets['password']
 port = database_secrets["port"]
 
+# The agent caches the schema description of the SQL tables given to the LLM,
+# it is refreshed when the version of a table in this table changes.
+TABLE_VERSIONS_TABLE_NAME = "sql_table_versions"
+# Checksum of every csv file (partition) loaded into the tables with a natural
+# key, used to only upsert the partitions that changed since the last load.
+PARTITION_CHECKSUMS_TABLE_NAME = "sql_table_partition_checksums"
+
 db_connection = psycopg2.connect(
     host=host,
     port=port,
@@ -64,13 +74,549 @@ def test_db_connection():
     conn.close()
 
 
-def load_sql_tables(raw_tables_base_path, raw_tables_data_paths, columns_to_load, engine):
+def bump_table_version(table_name, engine):
+    """Increment the version of a table after (re)loading it."""
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_VERSIONS_TABLE_NAME} ("
+                " table_name TEXT PRIMARY KEY,"
+                " version BIGINT NOT NULL,"
+                " updated_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            )
+        )
+        connection.execute(
+            sqlalchemy.text(
+                f"INSERT INTO {TABLE_VERSIONS_TABLE_NAME} (table_name, version)"
+                " VALUES (:table_name, 1)"
+                " ON CONFLICT (table_name) DO UPDATE"
+                f" SET version = {TABLE_VERSIONS_TABLE_NAME}.version + 1,"
+                " updated_at = now()"
+            ),
+            {"table_name": table_name},
+        )
+
+
+# PostgreSQL type of the columns by kind of pandas dtype, the other columns are TEXT.
+POSTGRESQL_TYPES = {
+    "i": "BIGINT",
+    "u": "BIGINT",
+    "f": "DOUBLE PRECISION",
+    "b": "BOOLEAN",
+}
+# pandas dtype used to read the columns by kind of inferred dtype, the integer
+# and boolean columns are nullable in case the sample had no missing values.
+PINNED_PANDAS_DTYPES = {
+    "i": "Int64",
+    "u": "Int64",
+    "f": "float64",
+    "b": "boolean",
+}
+
+
+def quote_identifier(name):
+    """Quote a table, column or index name for PostgreSQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def infer_column_types(data_loading_path, blocksize):
+    """Infer the pandas and PostgreSQL types of the columns of a csv file.
+
+    The types are inferred by dask from a sample of the beginning of the data
+    and pinned for all the partitions, so they all match the table.
+    """
+    sample_dtypes = dd.read_csv(data_loading_path, blocksize=blocksize).dtypes
+    pandas_dtypes = {}
+    postgresql_types = {}
+    for column, dtype in sample_dtypes.items():
+        pandas_dtypes[column] = PINNED_PANDAS_DTYPES.get(dtype.kind, "object")
+        postgresql_types[column] = POSTGRESQL_TYPES.get(dtype.kind, "TEXT")
+    return pandas_dtypes, postgresql_types
+
+
+def copy_dataframe(dataframe, table_name, cursor):
+    """Load a dataframe into an existing table with COPY."""
+    rows = io.StringIO()
+    dataframe.to_csv(rows, index=False, header=False)
+    rows.seek(0)
+    cursor.copy_expert(
+        f"COPY {quote_identifier(table_name)}"
+        f" ({', '.join(quote_identifier(column) for column in dataframe.columns)})"
+        " FROM STDIN WITH (FORMAT csv)",
+        rows,
+    )
+
+
+def get_index_name(table_name, index_columns, unique=False):
+    return f"{table_name}_{'_'.join(index_columns)}_{'key' if unique else 'idx'}"
+
+
+def get_duplicate_keys_query(table_name, natural_key, max_keys=5):
+    """Return a query of the natural key values found in several rows."""
+    quoted_natural_key = ", ".join(quote_identifier(column) for column in natural_key)
+    return (
+        f"SELECT {quoted_natural_key}, count(*) FROM {quote_identifier(table_name)}"
+        f" GROUP BY {quoted_natural_key} HAVING count(*) > 1 LIMIT {max_keys}"
+    )
+
+
+def check_duplicate_keys(duplicate_keys, table_name, natural_key):
+    """Fail the load when the rows loaded into a table share a natural key."""
+    if duplicate_keys:
+        raise ValueError(
+            f"The natural key {natural_key} of {table_name} is not unique in the"
+            f" csv files, e.g. (key values..., count): {duplicate_keys}."
+            " Remove the duplicate rows, the table was not changed."
+        )
+
+
+def swap_staging_table(
+    staging_table_name, table_name, index_names, engine, view_names=None
+):
+    """Replace the table by the staging table in a single transaction.
+
+    The queries on the table wait for the swap and then read the new data,
+    the table is never missing. index_names maps the names of the indexes
+    of the staging table to their names on the table, view_names does the
+    same for the materialized views built on the staging table, which
+    replace the views of the table. The table is dropped without CASCADE,
+    the swap fails if other objects depend on it.
+    """
+    view_names = view_names or {}
+    with engine.begin() as connection:
+        for view_name in view_names.values():
+            connection.execute(
+                sqlalchemy.text(
+                    f"DROP MATERIALIZED VIEW IF EXISTS {quote_identifier(view_name)}"
+                )
+            )
+        connection.execute(
+            sqlalchemy.text(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        )
+        connection.execute(
+            sqlalchemy.text(
+                f"ALTER TABLE {quote_identifier(staging_table_name)}"
+                f" RENAME TO {quote_identifier(table_name)}"
+            )
+        )
+        for staging_view_name, view_name in view_names.items():
+            connection.execute(
+                sqlalchemy.text(
+                    f"ALTER MATERIALIZED VIEW {quote_identifier(staging_view_name)}"
+                    f" RENAME TO {quote_identifier(view_name)}"
+                )
+            )
+        for staging_index_name, index_name in index_names.items():
+            connection.execute(
+                sqlalchemy.text(
+                    f"ALTER INDEX {quote_identifier(staging_index_name)}"
+                    f" RENAME TO {quote_identifier(index_name)}"
+                )
+            )
+
+
+def create_summary_view(
+    view_name, table_name, group_by_columns, aggregates, connection
+):
+    """Create a materialized view of aggregates of a table and its unique index.
+
+    Returns the name of the unique index on the group by columns.
+    """
+    quoted_group_by_columns = ", ".join(
+        quote_identifier(column) for column in group_by_columns
+    )
+    view_index_name = get_index_name(view_name, group_by_columns, unique=True)
+    connection.execute(
+        sqlalchemy.text(
+            f"CREATE MATERIALIZED VIEW {quote_identifier(view_name)} AS"
+            f" SELECT {quoted_group_by_columns}, {', '.join(aggregates)}"
+            f" FROM {quote_identifier(table_name)}"
+            f" GROUP BY {quoted_group_by_columns}"
+        )
+    )
+    connection.execute(
+        sqlalchemy.text(
+            f"CREATE UNIQUE INDEX {quote_identifier(view_index_name)}"
+            f" ON {quote_identifier(view_name)} ({quoted_group_by_columns})"
+        )
+    )
+    return view_index_name
+
+
+def load_sql_table(
+    data_loading_path,
+    table_name,
+    columns_to_load,
+    indexes,
+    engine,
+    blocksize,
+    natural_key=None,
+    summary_views=None,
+):
+    """Stream a csv file into a staging table with COPY and swap it in place.
+
+    The partitions of the csv file are read and copied one at a time,
+    so only one partition is in memory. The natural_key columns, if any,
+    get a unique index, the load fails if the csv files have duplicate keys.
+    The summary_views, see refresh_summary_views, are built on the staging
+    table and swapped in with it.
+    """
+    staging_table_name = f"{table_name}__staging"
+    summary_views = summary_views or {}
+
+    pandas_dtypes, postgresql_types = infer_column_types(
+        data_loading_path, blocksize
+    )
+    if columns_to_load == "all":
+        columns_to_load = list(pandas_dtypes)
+
+    with engine.begin() as connection:
+        # Views left over by a failed load depend on the staging table.
+        for view_name in summary_views:
+            connection.execute(
+                sqlalchemy.text(
+                    "DROP MATERIALIZED VIEW IF EXISTS"
+                    f" {quote_identifier(f'{view_name}__staging')}"
+                )
+            )
+        connection.execute(
+            sqlalchemy.text(
+                f"DROP TABLE IF EXISTS {quote_identifier(staging_table_name)}"
+            )
+        )
+        connection.execute(
+            sqlalchemy.text(
+                f"CREATE TABLE {quote_identifier(staging_table_name)} ("
+                + ", ".join(
+                    f"{quote_identifier(column)} {postgresql_types[column]}"
+                    for column in columns_to_load
+                )
+                + ")"
+            )
+        )
+
+    data_df = dd.read_csv(
+        data_loading_path,
+        blocksize=blocksize,
+        dtype=pandas_dtypes,
+    )
+    num_rows = 0
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            for partition in data_df.to_delayed():
+                partition_df = partition.compute()[columns_to_load]
+                copy_dataframe(partition_df, staging_table_name, cursor)
+                num_rows += len(partition_df)
+        connection.commit()
+    finally:
+        connection.close()
+    print(f"Copied {num_rows} rows into {staging_table_name}")
+
+    index_names = {}
+    index_definitions = [(index_columns, False) for index_columns in indexes]
+    if natural_key:
+        index_definitions.append((natural_key, True))
+    with engine.begin() as connection:
+        if natural_key:
+            duplicate_keys = connection.execute(
+                sqlalchemy.text(
+                    get_duplicate_keys_query(staging_table_name, natural_key)
+                )
+            ).fetchall()
+            check_duplicate_keys(
+                [tuple(row) for row in duplicate_keys], table_name, natural_key
+            )
+        for index_columns, unique in index_definitions:
+            staging_index_name = get_index_name(
+                staging_table_name, index_columns, unique
+            )
+            index_names[staging_index_name] = get_index_name(
+                table_name, index_columns, unique
+            )
+            quoted_index_columns = ", ".join(
+                quote_identifier(column) for column in index_columns
+            )
+            connection.execute(
+                sqlalchemy.text(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX"
+                    f" {quote_identifier(staging_index_name)}"
+                    f" ON {quote_identifier(staging_table_name)}"
+                    f" ({quoted_index_columns})"
+                )
+            )
+        connection.execute(
+            sqlalchemy.text(f"ANALYZE {quote_identifier(staging_table_name)}")
+        )
+
+    view_names = {}
+    with engine.begin() as connection:
+        for view_name, (group_by_columns, aggregates) in summary_views.items():
+            print(f"Creating the materialized view {view_name} on {staging_table_name}")
+            staging_view_name = f"{view_name}__staging"
+            staging_view_index_name = create_summary_view(
+                staging_view_name,
+                staging_table_name,
+                group_by_columns,
+                aggregates,
+                connection,
+            )
+            view_names[staging_view_name] = view_name
+            index_names[staging_view_index_name] = get_index_name(
+                view_name, group_by_columns, unique=True
+            )
+
+    swap_staging_table(staging_table_name, table_name, index_names, engine, view_names)
+
+
+def compute_file_checksum(file_path, block_size=1 << 20):
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def compute_partition_checksums(data_loading_path):
+    """Return the checksum of each csv file of a table, by file name."""
+    return {
+        os.path.basename(file_path): compute_file_checksum(file_path)
+        for file_path in sorted(glob.glob(data_loading_path))
+    }
+
+
+def get_partition_checksums(table_name, engine):
+    """Return the checksums of the partitions loaded into a table."""
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                f"CREATE TABLE IF NOT EXISTS {PARTITION_CHECKSUMS_TABLE_NAME} ("
+                " table_name TEXT NOT NULL,"
+                " partition_name TEXT NOT NULL,"
+                " checksum TEXT NOT NULL,"
+                " loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+                " PRIMARY KEY (table_name, partition_name))"
+            )
+        )
+        rows = connection.execute(
+            sqlalchemy.text(
+                "SELECT partition_name, checksum"
+                f" FROM {PARTITION_CHECKSUMS_TABLE_NAME}"
+                " WHERE table_name = :table_name"
+            ),
+            {"table_name": table_name},
+        ).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def record_partition_checksum(table_name, partition_name, checksum, cursor):
+    cursor.execute(
+        f"INSERT INTO {PARTITION_CHECKSUMS_TABLE_NAME}"
+        " (table_name, partition_name, checksum) VALUES (%s, %s, %s)"
+        " ON CONFLICT (table_name, partition_name) DO UPDATE"
+        " SET checksum = EXCLUDED.checksum, loaded_at = now()",
+        (table_name, partition_name, checksum),
+    )
+
+
+def record_partition_checksums(table_name, partition_checksums, engine):
+    """Replace the checksums of the partitions loaded into a table."""
+    get_partition_checksums(table_name, engine)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {PARTITION_CHECKSUMS_TABLE_NAME}"
+                " WHERE table_name = %s",
+                (table_name,),
+            )
+            for partition_name, checksum in partition_checksums.items():
+                record_partition_checksum(
+                    table_name, partition_name, checksum, cursor
+                )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def upsert_sql_table(data_loading_path, table_name, natural_key, engine, blocksize):
+    """Upsert the rows of the csv partitions that changed since the last load.
+
+    The partitions whose checksum matches the stored one are skipped. The
+    rows of each changed partition are copied into a temporary table and
+    upserted on the natural key with INSERT ... ON CONFLICT, the rows equal
+    to the ones already in the table are not rewritten. The partition and
+    its checksum are committed together. Like a full load, the upsert fails
+    if the partition has duplicate keys.
+
+    The rows removed from the csv files are not deleted, a full reload
+    removes them. A key of a changed partition already in the table is an
+    update of that row, even if it was loaded from another partition.
+
+    Returns the number of inserted or updated rows.
+    """
+    upsert_table_name = f"{table_name}__upsert"
+    table_columns = [
+        column["name"] for column in sqlalchemy.inspect(engine).get_columns(table_name)
+    ]
+    update_columns = [column for column in table_columns if column not in natural_key]
+
+    quoted_columns = ", ".join(quote_identifier(column) for column in table_columns)
+    quoted_natural_key = ", ".join(quote_identifier(column) for column in natural_key)
+    upsert_query = (
+        f"INSERT INTO {quote_identifier(table_name)} ({quoted_columns})"
+        f" SELECT {quoted_columns}"
+        f" FROM {quote_identifier(upsert_table_name)}"
+        f" ON CONFLICT ({quoted_natural_key}) DO "
+    )
+    if not update_columns:
+        upsert_query += "NOTHING"
+    else:
+        upsert_query += (
+            "UPDATE SET "
+            + ", ".join(
+                f"{quote_identifier(column)} = EXCLUDED.{quote_identifier(column)}"
+                for column in update_columns
+            )
+            + " WHERE ("
+            + ", ".join(
+                f"{quote_identifier(table_name)}.{quote_identifier(column)}"
+                for column in update_columns
+            )
+            + ") IS DISTINCT FROM ("
+            + ", ".join(
+                f"EXCLUDED.{quote_identifier(column)}" for column in update_columns
+            )
+            + ")"
+        )
+
+    with engine.begin() as connection:
+        # Tables loaded before the natural key was declared have no unique index.
+        connection.execute(
+            sqlalchemy.text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS"
+                f" {quote_identifier(get_index_name(table_name, natural_key, True))}"
+                f" ON {quote_identifier(table_name)} ({quoted_natural_key})"
+            )
+        )
+
+    stored_checksums = get_partition_checksums(table_name, engine)
+    partition_checksums = compute_partition_checksums(data_loading_path)
+    num_upserted_rows = 0
+
+    for partition_name, checksum in partition_checksums.items():
+        if stored_checksums.get(partition_name) == checksum:
+            continue
+
+        print(f"Upserting the rows of {partition_name} into {table_name}")
+        # The values are kept as text and cast by PostgreSQL to the column types.
+        data_df = dd.read_csv(
+            os.path.join(os.path.dirname(data_loading_path), partition_name),
+            blocksize=blocksize,
+            dtype=str,
+        )
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {quote_identifier(upsert_table_name)}"
+                    f" (LIKE {quote_identifier(table_name)}) ON COMMIT DROP"
+                )
+                for partition in data_df.to_delayed():
+                    copy_dataframe(
+                        partition.compute()[table_columns], upsert_table_name, cursor
+                    )
+                cursor.execute(get_duplicate_keys_query(upsert_table_name, natural_key))
+                check_duplicate_keys(cursor.fetchall(), table_name, natural_key)
+                cursor.execute(upsert_query)
+                num_upserted_rows += cursor.rowcount
+                record_partition_checksum(table_name, partition_name, checksum, cursor)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    removed_partitions = stored_checksums.keys() - partition_checksums.keys()
+    if removed_partitions:
+        with engine.begin() as connection:
+            connection.execute(
+                sqlalchemy.text(
+                    f"DELETE FROM {PARTITION_CHECKSUMS_TABLE_NAME}"
+                    " WHERE table_name = :table_name"
+                    " AND partition_name = ANY(:partition_names)"
+                ),
+                {
+                    "table_name": table_name,
+                    "partition_names": list(removed_partitions),
+                },
+            )
+
+    print(f"Upserted {num_upserted_rows} rows into {table_name}")
+    return num_upserted_rows
+
+
+def refresh_summary_views(table_name, summary_views, engine, table_changed=True):
+    """Create or refresh the materialized views of aggregates of a table.
+
+    summary_views maps the name of each view to its group by columns and
+    its aggregate expressions. The missing views are created, the existing
+    ones are refreshed when table_changed is True, concurrently thanks to
+    their unique index on the group by columns so they stay readable.
+    """
+    for view_name, (group_by_columns, aggregates) in summary_views.items():
+        with engine.begin() as connection:
+            view_exists = connection.execute(
+                sqlalchemy.text(
+                    "SELECT 1 FROM pg_matviews WHERE matviewname = :view_name"
+                ),
+                {"view_name": view_name},
+            ).scalar()
+            if view_exists:
+                if table_changed:
+                    print(f"Refreshing the materialized view {view_name}")
+                    connection.execute(
+                        sqlalchemy.text(
+                            "REFRESH MATERIALIZED VIEW CONCURRENTLY"
+                            f" {quote_identifier(view_name)}"
+                        )
+                    )
+                continue
+
+            print(f"Creating the materialized view {view_name}")
+            create_summary_view(
+                view_name, table_name, group_by_columns, aggregates, connection
+            )
+
+
+def load_sql_tables(
+    raw_tables_base_path,
+    raw_tables_data_paths,
+    columns_to_load,
+    engine,
+    table_indexes=None,
+    table_natural_keys=None,
+    table_summary_views=None,
+    full_reload=False,
+    blocksize="64MB",
+):
     """Load csv files as SQL tables into an Amazon Aurora PostgreSQL DB.
 
+    The tables with a natural key are loaded incrementally once they exist,
+    unless full_reload is True, the other tables are fully reloaded.
+
     Note:
         raw_tables_data_paths (List, str): a list of strings, each string
         can be a csv file, or a folder that contains a partitioned csv file.
+        table_indexes (Dict): the lists of columns to index of each table.
+        table_natural_keys (Dict): the columns identifying a row of each table.
+        table_summary_views (Dict): the materialized views of aggregates of
+            each table, see refresh_summary_views.
     """
+    table_indexes = table_indexes or {}
+    table_natural_keys = table_natural_keys or {}
+    table_summary_views = table_summary_views or {}
 
     for raw_table_path in raw_tables_data_paths:
         data_loading_path = os.path.join(
@@ -84,16 +630,40 @@ def load_sql_tables(raw_tables_base_path, raw_tables_data_paths, columns_to_load
         else:
             table_name = raw_table_path.split(".")[0]
 
-        print(f"Loading {table_name} data into a pandas dataframe")
-        current_data_df = dd.read_csv(data_loading_path).compute()
-        if columns_to_load == "all":
-            columns_to_load = current_data_df.columns
-
-        current_data_df = current_data_df[columns_to_load]
+        natural_key = table_natural_keys.get(table_name)
+        if (
+            natural_key
+            and not full_reload
+            and sqlalchemy.inspect(engine).has_table(table_name)
+        ):
+            num_upserted_rows = upsert_sql_table(
+                data_loading_path, table_name, natural_key, engine, blocksize
+            )
+            refresh_summary_views(
+                table_name,
+                table_summary_views.get(table_name, {}),
+                engine,
+                table_changed=num_upserted_rows > 0,
+            )
+            if num_upserted_rows:
+                bump_table_version(table_name, engine)
+            continue
 
-        current_data_df.to_sql(
-            table_name, engine, if_exists='replace', index=False
+        print(f"Loading {table_name} data into a staging table")
+        partition_checksums = compute_partition_checksums(data_loading_path)
+        load_sql_table(
+            data_loading_path,
+            table_name,
+            columns_to_load,
+            table_indexes.get(table_name, []),
+            engine,
+            blocksize,
+            natural_key=natural_key,
+            summary_views=table_summary_views.get(table_name, {}),
         )
+        if natural_key:
+            record_partition_checksums(table_name, partition_checksums, engine)
+        bump_table_version(table_name, engine)
 
     return True
 
@@ -115,13 +685,60 @@ if __name__ == "__main__":
     raw_sql_tables_base_path = os.path.join(input_data_base_path, "sqltables")
     tables_raw_data_paths = os.listdir(raw_sql_tables_base_path)
     columns_to_load = "all"
+    # Columns filtered on by the queries of the agent, the natural key
+    # of a table is also indexed. SQL_TABLE_INDEXES overrides them with
+    # a JSON object of the lists of columns to index by table.
+    table_indexes = json.loads(
+        os.environ.get(
+            "SQL_TABLE_INDEXES",
+            json.dumps({"extracted_entities": [["year"], ["revenue_unit"]]}),
+        )
+    )
+    # Columns identifying a row, the tables with a natural key are upserted
+    # incrementally. Set SQL_TABLES_FULL_RELOAD to true to reload them fully.
+    table_natural_keys = {"extracted_entities": ["company", "year"]}
+    full_reload = os.environ.get("SQL_TABLES_FULL_RELOAD", "false").lower() == "true"
+    # Materialized views of aggregates precomputed for the typical questions
+    # of the agent, advertised to the LLM in agent/sqlqa.py, by table:
+    # view name -> (group by columns, aggregate expressions).
+    # The revenues are only aggregated within the same currency.
+    entities_aggregates = [
+        "count(*) AS num_reports",
+        "avg(revenue) AS avg_revenue",
+        "min(revenue) AS min_revenue",
+        "max(revenue) AS max_revenue",
+        "sum(revenue) AS total_revenue",
+        "avg(human_capital) AS avg_employees",
+        "min(human_capital) AS min_employees",
+        "max(human_capital) AS max_employees",
+    ]
+    table_summary_views = {
+        "extracted_entities": {
+            "extracted_entities_by_company": (
+                ["company", "revenue_unit"],
+                entities_aggregates
+                + ["min(year) AS first_year", "max(year) AS last_year"],
+            ),
+            "extracted_entities_by_year": (
+                ["year", "revenue_unit"],
+                entities_aggregates + ["count(DISTINCT company) AS num_companies"],
+            ),
+        }
+    }
+    # Size of the csv partitions copied one at a time.
+    csv_blocksize = os.environ.get("CSV_BLOCKSIZE", "64MB")
 
     print(raw_sql_tables_base_path, tables_raw_data_paths)
     load_sql_tables(
         raw_sql_tables_base_path,
         tables_raw_data_paths,
         columns_to_load,
-        db_engine
+        db_engine,
+        table_indexes=table_indexes,
+        table_natural_keys=table_natural_keys,
+        table_summary_views=table_summary_views,
+        full_reload=full_reload,
+        blocksize=csv_blocksize,
     )
 
     test_db_connection()
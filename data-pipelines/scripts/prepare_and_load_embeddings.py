@@ -1,61 +1,25 @@
+import collections
+import csv
+import hashlib
+import io
 import json
 import os
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from botocore.config import Config
 import boto3
 from langchain.embeddings import BedrockEmbeddings
 from langchain.schema.document import Document
-from langchain.text_splitter import TokenTextSplitter
+from langchain.text_splitter import Tokenizer, split_text_on_tokens
 from langchain.vectorstores.pgvector import PGVector
 
 import psycopg2
 import sqlalchemy
 
-ssm = boto3.client("ssm")
-
-secretsmanager = boto3.client("secretsmanager")
-secret_response = secretsmanager.get_secret_value(
-    SecretId=os.environ["SQL_DB_SECRET_ID"]
-)
-database_secrets = json.loads(secret_response["SecretString"])
-
-# Extract credentials
-host = database_secrets['host']
-dbname = database_secrets['dbname']
-username = database_secrets['username']
-password = database_secrets['password']
-port = database_secrets["port"]
-
-CONNECTION_STRING = PGVector.connection_string_from_db_params(
-    driver="psycopg2",
-    host=host,
-    port=port,
-    database=dbname,
-    user=username,
-    password=password,
-)
-
-db_connection = psycopg2.connect(
-    host=host,
-    port=port,
-    database=dbname,
-    user=username,
-    password=password,
-)
-
-BEDROCK_CROSS_ACCOUNT_ROLE_ARN = os.environ.get("BEDROCK_CROSS_ACCOUNT_ROLE_ARN")
-bedrock_region_parameter = "/AgenticLLMAssistant/bedrock_region"
-
-BEDROCK_REGION = ssm.get_parameter(Name=bedrock_region_parameter)
-BEDROCK_REGION = BEDROCK_REGION["Parameter"]["Value"]
-
-retry_config = Config(
-    region_name=BEDROCK_REGION,
-    retries={"max_attempts": 10, "mode": "standard"}
-)
-bedrock_runtime = boto3.client("bedrock-runtime", config=retry_config)
-bedrock = boto3.client("bedrock", config=retry_config)
-
-
 def activate_vector_extension(db_connection):
     """Activate PGVector extension."""
 
@@ -90,11 +54,562 @@ def test_db_connection():
     conn.close()
 
 
-def prepare_documents_with_metadata(documents_processed):
+# Table created by langchain PGVector to store the embeddings of all collections.
+EMBEDDINGS_TABLE_NAME = "langchain_pg_embedding"
+ANN_INDEX_NAMES = {
+    "hnsw": f"{EMBEDDINGS_TABLE_NAME}_hnsw_idx",
+    "ivfflat": f"{EMBEDDINGS_TABLE_NAME}_ivfflat_idx",
+}
+
+
+def create_ann_index(
+    engine,
+    index_type="hnsw",
+    embedding_dimension=1536,
+    hnsw_m=16,
+    hnsw_ef_construction=64,
+    ivfflat_lists=None,
+):
+    """Create or rebuild the approximate nearest neighbour index of the embeddings.
+
+    The HNSW index is maintained by PostgreSQL on inserts, it is only rebuilt
+    when its build parameters change. The IVFFlat index clusters the existing
+    embeddings, so it is rebuilt on every call to fit the current data.
+    When ivfflat_lists is not provided, it is set to rows / 1000 (at least 10)
+    as recommended by pgvector.
+
+    Note: the index uses the cosine distance, the default distance strategy
+    of langchain PGVector, and requires pgvector >= 0.5.0 for HNSW.
+    """
+    if index_type not in ANN_INDEX_NAMES:
+        raise ValueError(
+            f"index_type must be one of {list(ANN_INDEX_NAMES)}, got {index_type}"
+        )
+    index_name = ANN_INDEX_NAMES[index_type]
+
+    with engine.begin() as connection:
+        # langchain creates the embedding column without a dimension,
+        # which is required to index it.
+        connection.execute(
+            sqlalchemy.text(
+                f"ALTER TABLE {EMBEDDINGS_TABLE_NAME}"
+                f" ALTER COLUMN embedding TYPE vector({embedding_dimension})"
+            )
+        )
+
+        # Only keep one ANN index on the embeddings.
+        for other_index_type, other_index_name in ANN_INDEX_NAMES.items():
+            if other_index_type != index_type:
+                connection.execute(
+                    sqlalchemy.text(f"DROP INDEX IF EXISTS {other_index_name}")
+                )
+
+        if index_type == "hnsw":
+            index_options = [f"m={hnsw_m}", f"ef_construction={hnsw_ef_construction}"]
+            current_index_options = connection.execute(
+                sqlalchemy.text(
+                    "SELECT reloptions FROM pg_class WHERE relname = :index_name"
+                ),
+                {"index_name": index_name},
+            ).scalar()
+            if current_index_options == index_options:
+                print(f"The index {index_name} is up to date.")
+                return
+        else:
+            if ivfflat_lists is None:
+                num_rows = connection.execute(
+                    sqlalchemy.text(f"SELECT count(*) FROM {EMBEDDINGS_TABLE_NAME}")
+                ).scalar()
+                ivfflat_lists = max(num_rows // 1000, 10)
+            index_options = [f"lists={ivfflat_lists}"]
+
+        print(f"Building the index {index_name} with {index_options}")
+        connection.execute(sqlalchemy.text(f"DROP INDEX IF EXISTS {index_name}"))
+        connection.execute(
+            sqlalchemy.text(
+                f"CREATE INDEX {index_name} ON {EMBEDDINGS_TABLE_NAME}"
+                f" USING {index_type} (embedding vector_cosine_ops)"
+                f" WITH ({', '.join(index_options)})"
+            )
+        )
+
+
+def create_metadata_indexes(engine, metadata_keys):
+    """Index the metadata used by the agent to filter the semantic search.
+
+    The expression indexes match the cmetadata ->> 'key' = value predicates
+    generated by langchain PGVector for metadata filters.
+    """
+    with engine.begin() as connection:
+        for metadata_key in metadata_keys:
+            connection.execute(
+                sqlalchemy.text(
+                    "CREATE INDEX IF NOT EXISTS"
+                    f" {EMBEDDINGS_TABLE_NAME}_{metadata_key}_idx"
+                    f" ON {EMBEDDINGS_TABLE_NAME} ((cmetadata ->> '{metadata_key}'))"
+                )
+            )
+
+
+def create_lexical_index(engine, text_search_config="english"):
+    """Index the chunks for full text search, the lexical side of hybrid search.
+
+    The document_tsv column is generated by PostgreSQL from the chunk text,
+    so it stays in sync with the rows inserted by langchain PGVector,
+    and is served by a GIN index.
+    """
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                f"ALTER TABLE {EMBEDDINGS_TABLE_NAME}"
+                " ADD COLUMN IF NOT EXISTS document_tsv tsvector"
+                f" GENERATED ALWAYS AS (to_tsvector('{text_search_config}',"
+                " coalesce(document, ''))) STORED"
+            )
+        )
+        connection.execute(
+            sqlalchemy.text(
+                f"CREATE INDEX IF NOT EXISTS {EMBEDDINGS_TABLE_NAME}_document_tsv_idx"
+                f" ON {EMBEDDINGS_TABLE_NAME} USING gin (document_tsv)"
+            )
+        )
+
+
+THROTTLING_ERROR_CODES = [
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+]
+
+
+def is_throttling_error(error):
+    """Return True if the error is Bedrock throttling the requests.
+
+    BedrockEmbeddings wraps the botocore errors in a ValueError,
+    so the error codes are looked up in the message.
+    """
+    return any(error_code in str(error) for error_code in THROTTLING_ERROR_CODES)
+
+
+class ConcurrentEmbedder:
+    """Embed texts with concurrent requests and an adaptive concurrency limit.
+
+    The requests run on a pool of max_concurrency threads, but only
+    concurrency of them are in flight at a time. The limit is halved on every
+    throttling error (the request is retried after an exponential backoff)
+    and increased by one after concurrency successful requests in a row,
+    up to max_concurrency. The embeddings are returned in the order of the
+    texts.
+
+    embed_function embeds one text, e.g. BedrockEmbeddings.embed_query,
+    so a fake embedder simulating latency and throttling can be used to
+    test it.
+    """
+
+    def __init__(
+        self,
+        embed_function,
+        max_concurrency=16,
+        initial_concurrency=4,
+        max_attempts=8,
+        initial_backoff_seconds=0.5,
+        max_backoff_seconds=20.0,
+        is_throttling_error=is_throttling_error,
+        report_every_n_texts=500,
+    ):
+        self.embed_function = embed_function
+        self.max_concurrency = max_concurrency
+        self.concurrency = min(initial_concurrency, max_concurrency)
+        self.max_attempts = max_attempts
+        self.initial_backoff_seconds = initial_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.is_throttling_error = is_throttling_error
+        self.report_every_n_texts = report_every_n_texts
+
+        self._in_flight = 0
+        self._successes_in_a_row = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._start_time = None
+        self._num_returned = 0
+        self.num_embedded = 0
+        self.num_throttled = 0
+
+    def _acquire(self):
+        with self._condition:
+            while self._in_flight >= self.concurrency:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def _release(self, throttled):
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self.num_throttled += 1
+                self._successes_in_a_row = 0
+                self.concurrency = max(self.concurrency // 2, 1)
+            else:
+                self.num_embedded += 1
+                self._successes_in_a_row += 1
+                if (
+                    self._successes_in_a_row >= self.concurrency
+                    and self.concurrency < self.max_concurrency
+                ):
+                    self._successes_in_a_row = 0
+                    self.concurrency += 1
+            self._condition.notify_all()
+
+    def _embed(self, text):
+        for attempt in range(self.max_attempts):
+            self._acquire()
+            try:
+                embedding = self.embed_function(text)
+            except Exception as error:
+                throttled = self.is_throttling_error(error)
+                self._release(throttled=throttled)
+                if not throttled or attempt == self.max_attempts - 1:
+                    raise
+                backoff_seconds = min(
+                    self.initial_backoff_seconds * 2**attempt,
+                    self.max_backoff_seconds,
+                )
+                # Full jitter, to spread the retries of the throttled requests.
+                time.sleep(random.uniform(0, backoff_seconds))
+            else:
+                self._release(throttled=False)
+                return embedding
+
+    def report_throughput(self):
+        """Print the throughput since the first call to embed_documents."""
+        elapsed_seconds = time.perf_counter() - (self._start_time or 0.0)
+        print(
+            f"Embedded {self.num_embedded} chunks,"
+            f" {self.num_embedded / max(elapsed_seconds, 1e-9):.1f} chunks/s,"
+            f" concurrency {self.concurrency},"
+            f" {self.num_throttled} throttled requests so far."
+        )
+
+    def embed_documents(self, texts):
+        """Embed the texts, returning the embeddings in the same order."""
+        if self._start_time is None:
+            self._start_time = time.perf_counter()
+        embeddings = []
+        for embedding in self._executor.map(self._embed, texts):
+            embeddings.append(embedding)
+            self._num_returned += 1
+            if self._num_returned % self.report_every_n_texts == 0:
+                self.report_throughput()
+        return embeddings
+
+
+def compute_chunk_id(chunk, chunking_settings):
+    """Return a stable hash of a chunk, its metadata and the chunking settings.
+
+    The hash is used as the id of the chunk in the vector store, a chunk whose
+    document, page, text or chunking settings change gets a new id.
+    """
+    chunk_description = json.dumps(
+        {
+            "text": chunk.page_content,
+            "metadata": chunk.metadata,
+            "chunking_settings": chunking_settings,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(chunk_description.encode("utf-8")).hexdigest()
+
+
+def get_indexed_chunk_ids(engine, collection_name):
+    """Return the ids of the chunks already in the collection."""
+    with engine.connect() as connection:
+        rows = connection.execute(
+            sqlalchemy.text(
+                f"SELECT e.custom_id FROM {EMBEDDINGS_TABLE_NAME} e"
+                " JOIN langchain_pg_collection c ON e.collection_id = c.uuid"
+                " WHERE c.name = :collection_name"
+            ),
+            {"collection_name": collection_name},
+        ).fetchall()
+    return {row[0] for row in rows}
+
+
+def delete_chunks(engine, collection_name, chunk_ids):
+    """Delete the chunks of the collection with the given ids."""
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                f"DELETE FROM {EMBEDDINGS_TABLE_NAME} e"
+                " USING langchain_pg_collection c"
+                " WHERE e.collection_id = c.uuid"
+                " AND c.name = :collection_name"
+                " AND e.custom_id = ANY(:chunk_ids)"
+            ),
+            {"collection_name": collection_name, "chunk_ids": list(chunk_ids)},
+        )
+
+
+def drop_ann_indexes(engine):
+    """Drop the ANN indexes, to load many embeddings without maintaining them."""
+    with engine.begin() as connection:
+        for index_name in ANN_INDEX_NAMES.values():
+            connection.execute(sqlalchemy.text(f"DROP INDEX IF EXISTS {index_name}"))
+
+
+class PGVectorCopyWriter:
+    """Write chunks and their embeddings to a collection with COPY.
+
+    Each call to add_embeddings stages the rows of a batch as CSV in memory
+    and loads them with one COPY in its own transaction, instead of one
+    ORM object and INSERT per chunk with PGVector.add_embeddings.
+    """
+
+    def __init__(self, engine, collection_name):
+        self.engine = engine
+        with engine.connect() as connection:
+            self.collection_id = connection.execute(
+                sqlalchemy.text(
+                    "SELECT uuid FROM langchain_pg_collection WHERE name = :name"
+                ),
+                {"name": collection_name},
+            ).scalar_one()
+        self.num_rows = 0
+        self.copy_seconds = 0.0
+
+    def add_embeddings(self, texts, embeddings, metadatas, ids):
+        """Load the chunks with the same arguments as PGVector.add_embeddings."""
+        rows = io.StringIO()
+        csv_writer = csv.writer(rows)
+        for text, embedding, metadata, chunk_id in zip(
+            texts, embeddings, metadatas, ids
+        ):
+            csv_writer.writerow(
+                [
+                    str(uuid.uuid4()),
+                    self.collection_id,
+                    "[" + ",".join(str(value) for value in embedding) + "]",
+                    text,
+                    json.dumps(metadata),
+                    chunk_id,
+                ]
+            )
+        rows.seek(0)
+
+        start_time = time.perf_counter()
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {EMBEDDINGS_TABLE_NAME}"
+                    " (uuid, collection_id, embedding, document, cmetadata, custom_id)"
+                    " FROM STDIN WITH (FORMAT csv)",
+                    rows,
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        self.copy_seconds += time.perf_counter() - start_time
+        self.num_rows += len(ids)
+
+    def report_throughput(self):
+        print(
+            f"Copied {self.num_rows} rows in {self.copy_seconds:.1f}s,"
+            f" {self.num_rows / max(self.copy_seconds, 1e-9):.1f} rows/s."
+        )
+
+
+def record_ingestion_manifest(engine, collection_name, manifest):
+    """Store the manifest of what an ingestion run indexed."""
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                "CREATE TABLE IF NOT EXISTS embedding_ingestion_manifest ("
+                " id BIGSERIAL PRIMARY KEY,"
+                " collection_name TEXT NOT NULL,"
+                " ingested_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+                " manifest JSONB NOT NULL)"
+            )
+        )
+        connection.execute(
+            sqlalchemy.text(
+                "INSERT INTO embedding_ingestion_manifest (collection_name, manifest)"
+                " VALUES (:collection_name, CAST(:manifest AS JSONB))"
+            ),
+            {"collection_name": collection_name, "manifest": json.dumps(manifest)},
+        )
 
-    langchain_documents_text = []
-    langchain_documents_tables = []
 
+def record_metadata_values(engine, collection_name, metadata_values):
+    """Replace the known values of the filterable metadata of the collection.
+
+    The agent reads them to detect the metadata mentioned in the questions,
+    instead of scanning the metadata of all the chunks of the collection.
+    """
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                "CREATE TABLE IF NOT EXISTS collection_metadata_values ("
+                " collection_name TEXT NOT NULL,"
+                " metadata_key TEXT NOT NULL,"
+                " metadata_value TEXT NOT NULL,"
+                " PRIMARY KEY (collection_name, metadata_key, metadata_value))"
+            )
+        )
+        connection.execute(
+            sqlalchemy.text(
+                "DELETE FROM collection_metadata_values"
+                " WHERE collection_name = :collection_name"
+            ),
+            {"collection_name": collection_name},
+        )
+        rows = [
+            {
+                "collection_name": collection_name,
+                "metadata_key": metadata_key,
+                "metadata_value": metadata_value,
+            }
+            for metadata_key, values in metadata_values.items()
+            for metadata_value in values
+        ]
+        if rows:
+            connection.execute(
+                sqlalchemy.text(
+                    "INSERT INTO collection_metadata_values"
+                    " (collection_name, metadata_key, metadata_value)"
+                    " VALUES (:collection_name, :metadata_key, :metadata_value)"
+                ),
+                rows,
+            )
+
+
+def run_in_background(iterable, max_queue_size):
+    """Iterate over iterable in a background thread.
+
+    At most max_queue_size items are produced ahead of the consumer, which
+    bounds the memory used between two stages of the ingestion pipeline while
+    letting them run concurrently.
+    """
+    items = queue.Queue(maxsize=max_queue_size)
+    end_of_items = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except BaseException as error:
+            items.put(error)
+        else:
+            items.put(end_of_items)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is end_of_items:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def index_chunks_incrementally(
+    vector_store_writer,
+    embedder,
+    engine,
+    collection_name,
+    chunks,
+    chunking_settings,
+    batch_size=256,
+    max_queued_batches=4,
+    metadata_keys=(),
+):
+    """Embed and add only the new chunks, and delete the ones that disappeared.
+
+    The chunks are consumed as they are produced: the new chunks are grouped
+    into batches of batch_size chunks, and the batches go through the
+    embedding and database writing stages concurrently, with at most
+    max_queued_batches batches waiting between two stages. Only the chunk ids
+    are kept for the whole run.
+
+    Returns the manifest of the indexed chunks per document, with the
+    distinct values of the metadata_keys of all the chunks of the collection.
+    """
+    indexed_chunk_ids = get_indexed_chunk_ids(engine, collection_name)
+    chunk_ids = set()
+    documents = {}
+    metadata_values = {metadata_key: set() for metadata_key in metadata_keys}
+
+    def iter_new_chunk_batches():
+        batch = []
+        for chunk in chunks:
+            chunk_id = compute_chunk_id(chunk, chunking_settings)
+            if chunk_id in chunk_ids:
+                continue
+            chunk_ids.add(chunk_id)
+            documents.setdefault(chunk.metadata["document_name"], []).append(
+                chunk_id
+            )
+            for metadata_key, values in metadata_values.items():
+                if chunk.metadata.get(metadata_key):
+                    values.add(str(chunk.metadata[metadata_key]))
+            if chunk_id in indexed_chunk_ids:
+                continue
+            batch.append((chunk_id, chunk))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def iter_embedded_batches(batches):
+        for batch in batches:
+            texts = [chunk.page_content for _, chunk in batch]
+            yield batch, embedder.embed_documents(texts)
+
+    num_added = 0
+    embedded_batches = run_in_background(
+        iter_embedded_batches(
+            run_in_background(iter_new_chunk_batches(), max_queued_batches)
+        ),
+        max_queued_batches,
+    )
+    for batch, embeddings in embedded_batches:
+        vector_store_writer.add_embeddings(
+            texts=[chunk.page_content for _, chunk in batch],
+            embeddings=embeddings,
+            metadatas=[chunk.metadata for _, chunk in batch],
+            ids=[chunk_id for chunk_id, _ in batch],
+        )
+        num_added += len(batch)
+    embedder.report_throughput()
+    if hasattr(vector_store_writer, "report_throughput"):
+        vector_store_writer.report_throughput()
+
+    stale_chunk_ids = indexed_chunk_ids - chunk_ids
+    if stale_chunk_ids:
+        delete_chunks(engine, collection_name, stale_chunk_ids)
+
+    print(
+        f"Added {num_added} chunks, deleted {len(stale_chunk_ids)} chunks"
+        f" and kept {len(chunk_ids) - num_added} unchanged chunks."
+    )
+
+    return {
+        "chunking_settings": chunking_settings,
+        "added": num_added,
+        "deleted": len(stale_chunk_ids),
+        "unchanged": len(chunk_ids) - num_added,
+        "metadata_values": {
+            metadata_key: sorted(values)
+            for metadata_key, values in metadata_values.items()
+        },
+        "documents": documents,
+    }
+
+
+def iter_page_documents(documents_processed):
+    """Turn each page, and each table of a page, into a Langchain Document."""
     for document in documents_processed:
         document_name = document['name']
         document_source_location = document['source_location']
@@ -122,31 +637,214 @@ def prepare_documents_with_metadata(documents_processed):
             # to be able to use them for filtering.
             current_metadata.update(document_s3_metadata)
 
-            langchain_documents_text.append(
-                Document(
-                    page_content=page['page_text'],
-                    metadata=current_metadata
-                )
+            yield Document(
+                page_content=page['page_text'],
+                metadata=current_metadata
             )
             # Turn all the tables of the pages into seperate Langchain Documents as well
             for table in page['page_tables']:
-                langchain_documents_tables.append(
-                    Document(
-                        page_content=table,
-                        metadata=current_metadata
-                    )
+                yield Document(
+                    page_content=table,
+                    metadata=current_metadata
                 )
 
-    return langchain_documents_text, langchain_documents_tables
 
+def load_tokenizer(tokenizer_name):
+    """Return the encode and decode functions of a tokenizer.
+
+    The tokenizer_name is either tiktoken:<encoding name>, e.g. tiktoken:gpt2,
+    or huggingface:<tokenizer>, where the tokenizer is a model id on the
+    Hugging Face Hub or the path to a tokenizer.json file, e.g. the Claude
+    tokenizer shipped with the anthropic package.
+    """
+    tokenizer_type, _, tokenizer_id = tokenizer_name.partition(":")
+    if tokenizer_type == "tiktoken":
+        import tiktoken
 
-def load_processed_documents(json_file_path):
-    with open(json_file_path, 'rb') as file:
-        processed_documents = json.load(file)
-    return processed_documents
+        encoding = tiktoken.get_encoding(tokenizer_id)
+        return (
+            lambda text: encoding.encode(text, disallowed_special=()),
+            encoding.decode,
+        )
+    if tokenizer_type == "huggingface":
+        from tokenizers import Tokenizer as HuggingFaceTokenizer
+
+        if os.path.isfile(tokenizer_id):
+            tokenizer = HuggingFaceTokenizer.from_file(tokenizer_id)
+        else:
+            tokenizer = HuggingFaceTokenizer.from_pretrained(tokenizer_id)
+        return (
+            lambda text: tokenizer.encode(text, add_special_tokens=False).ids,
+            tokenizer.decode,
+        )
+    raise ValueError(
+        "tokenizer_name must be tiktoken:<encoding name> or"
+        f" huggingface:<tokenizer>, got {tokenizer_name}"
+    )
+
+
+# The tokenizer of a chunking worker process, loaded once by its initializer.
+_worker_tokenizer = None
+
+
+def _init_chunking_worker(tokenizer_name, chunk_size, chunk_overlap):
+    global _worker_tokenizer
+    encode, decode = load_tokenizer(tokenizer_name)
+    _worker_tokenizer = Tokenizer(
+        chunk_overlap=chunk_overlap,
+        tokens_per_chunk=chunk_size,
+        decode=decode,
+        encode=encode,
+    )
+
+
+def _split_documents(documents):
+    return [
+        Document(page_content=chunk, metadata=dict(document.metadata))
+        for document in documents
+        for chunk in split_text_on_tokens(
+            text=document.page_content, tokenizer=_worker_tokenizer
+        )
+    ]
+
+
+def iter_chunks(
+    documents,
+    tokenizer_name,
+    chunk_size,
+    chunk_overlap,
+    num_workers=None,
+    documents_per_task=32,
+):
+    """Split the documents into chunks of chunk_size tokens on a process pool.
+
+    Each worker process loads the tokenizer once, and the documents are sent
+    to the workers in tasks of documents_per_task documents. At most two
+    tasks per worker are pending, so the documents are consumed as the
+    chunks are, and the chunks are yielded in the order of the documents.
+    """
+    num_workers = num_workers or os.cpu_count()
+    initargs = (tokenizer_name, chunk_size, chunk_overlap)
+
+    def iter_tasks():
+        task = []
+        for document in documents:
+            task.append(document)
+            if len(task) == documents_per_task:
+                yield task
+                task = []
+        if task:
+            yield task
+
+    if num_workers == 1:
+        _init_chunking_worker(*initargs)
+        for task in iter_tasks():
+            yield from _split_documents(task)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_chunking_worker,
+        initargs=initargs,
+    ) as executor:
+        pending_tasks = collections.deque()
+        for task in iter_tasks():
+            pending_tasks.append(executor.submit(_split_documents, task))
+            if len(pending_tasks) >= 2 * num_workers:
+                yield from pending_tasks.popleft().result()
+        while pending_tasks:
+            yield from pending_tasks.popleft().result()
+
+
+def iter_processed_documents(json_file_path, read_size=1 << 20):
+    """Yield the documents of the processed documents JSON array one by one.
+
+    The file is read incrementally and only one document is decoded at a
+    time, so the memory used depends on the largest document rather than
+    on the size of the file.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file_path, 'r', encoding='utf-8') as file:
+        buffer = file.read(read_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{json_file_path} must contain a JSON array.")
+        buffer = buffer[1:]
+
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                document, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # The next document is incomplete, read at least as much
+                # again to only decode large documents a few times.
+                data = file.read(max(read_size, len(buffer)))
+                if not data:
+                    raise
+                buffer += data
+                continue
+            yield document
+            buffer = buffer[end:]
 
 
 if __name__ == "__main__":
+    # The clients and the credentials are only created when the script runs,
+    # so its functions can be imported, e.g. by the benchmarks.
+    ssm = boto3.client("ssm")
+
+    secretsmanager = boto3.client("secretsmanager")
+    secret_response = secretsmanager.get_secret_value(
+        SecretId=os.environ["SQL_DB_SECRET_ID"]
+    )
+    database_secrets = json.loads(secret_response["SecretString"])
+
+    # Extract credentials
+    host = database_secrets['host']
+    dbname = database_secrets['dbname']
+    username = database_secrets['username']
+    password = database_secrets['password']
+    port = database_secrets["port"]
+
+    CONNECTION_STRING = PGVector.connection_string_from_db_params(
+        driver="psycopg2",
+        host=host,
+        port=port,
+        database=dbname,
+        user=username,
+        password=password,
+    )
+
+    db_connection = psycopg2.connect(
+        host=host,
+        port=port,
+        database=dbname,
+        user=username,
+        password=password,
+    )
+
+    BEDROCK_CROSS_ACCOUNT_ROLE_ARN = os.environ.get("BEDROCK_CROSS_ACCOUNT_ROLE_ARN")
+    bedrock_region_parameter = "/AgenticLLMAssistant/bedrock_region"
+
+    BEDROCK_REGION = ssm.get_parameter(Name=bedrock_region_parameter)
+    BEDROCK_REGION = BEDROCK_REGION["Parameter"]["Value"]
+
+    retry_config = Config(
+        region_name=BEDROCK_REGION,
+        retries={"max_attempts": 10, "mode": "standard"}
+    )
+    bedrock_runtime = boto3.client("bedrock-runtime", config=retry_config)
+    bedrock = boto3.client("bedrock", config=retry_config)
+    # The adaptive retry mode rate limits the client on throttling, and the few
+    # attempts let the remaining throttling errors reach the ConcurrentEmbedder,
+    # which lowers its concurrency instead of retrying blindly.
+    embedding_retry_config = retry_config.merge(
+        Config(retries={"max_attempts": 3, "mode": "adaptive"})
+    )
+    embedding_bedrock_runtime = boto3.client(
+        "bedrock-runtime", config=embedding_retry_config
+    )
+
     test_db_connection()
 
     url_object = sqlalchemy.URL.create(
@@ -161,11 +859,44 @@ if __name__ == "__main__":
     processed_docs_filename = "documents_processed.json"
     token_split_chunk_size = 512
     token_chunk_overlap = 64
+    # Tokenizer used to count the tokens of the chunks, see load_tokenizer.
+    # tiktoken:gpt2 is the tokenizer of langchain TokenTextSplitter, set it to
+    # the tokenizer of the embedding model when it is available.
+    tokenizer_name = os.environ.get("TOKENIZER", "tiktoken:gpt2")
+    # Number of processes splitting the documents, defaults to the number of CPUs.
+    num_chunking_workers = int(os.environ.get("CHUNKING_WORKERS", os.cpu_count()))
     # Define an embedding model to generate embeddings
     embedding_model_id = "amazon.titan-embed-text-v1"
     COLLECTION_NAME = 'agentic_assistant_vector_store'
-    # make this an argument.
-    pre_delete_collection = True
+    # Set to true to drop and re-embed the whole collection, by default only
+    # the new or changed chunks are embedded.
+    pre_delete_collection = (
+        os.environ.get("PRE_DELETE_COLLECTION", "false").lower() == "true"
+    )
+    # Approximate nearest neighbour index of the embeddings, hnsw or ivfflat.
+    ann_index_type = os.environ.get("ANN_INDEX_TYPE", "hnsw")
+    # Dimension of the amazon.titan-embed-text-v1 embeddings.
+    embedding_dimension = 1536
+    hnsw_m = int(os.environ.get("HNSW_M", 16))
+    hnsw_ef_construction = int(os.environ.get("HNSW_EF_CONSTRUCTION", 64))
+    ivfflat_lists = os.environ.get("IVFFLAT_LISTS")
+    # S3 metadata of the documents used by the agent to filter the semantic search.
+    filterable_metadata_keys = ["company", "year"]
+    # Maximum number of concurrent embedding requests to Bedrock.
+    max_embedding_concurrency = int(os.environ.get("MAX_EMBEDDING_CONCURRENCY", 16))
+    # Number of chunks embedded and written together, and number of batches
+    # buffered between the pipeline stages, which bounds the memory used.
+    embedding_batch_size = int(os.environ.get("EMBEDDING_BATCH_SIZE", 256))
+    max_queued_batches = int(os.environ.get("MAX_QUEUED_BATCHES", 4))
+    # Load the embeddings with COPY, set to false to insert them with PGVector.
+    bulk_copy_embeddings = (
+        os.environ.get("BULK_COPY_EMBEDDINGS", "true").lower() == "true"
+    )
+    # Drop the ANN index before loading and build it after, which is faster
+    # than maintaining it on every insert when loading many embeddings.
+    build_ann_index_after_loading = (
+        os.environ.get("BUILD_ANN_INDEX_AFTER_LOADING", "false").lower() == "true"
+    )
 
     db_engine = sqlalchemy.create_engine(url_object)
 
@@ -178,26 +909,27 @@ if __name__ == "__main__":
     print(processed_documents_file_path)
 
     if os.path.isfile(processed_documents_file_path):
-        processed_documents = load_processed_documents(processed_documents_file_path)
-        langchain_documents_text, langchain_documents_tables = prepare_documents_with_metadata(
-            processed_documents
-        )
+        # The documents are parsed, split and embedded as a stream,
+        # the embedding starts with the first document.
         # The chunk overlap duplicates some text across chunks
         # to prevent context from being lost between chunks.
-        # TODO: the following spliting uses tiktoken,
-        # create a custom one that use the tokenizer from anthropic.
-        text_splitter = TokenTextSplitter(
+        langchain_documents_text_chunked = iter_chunks(
+            iter_page_documents(
+                iter_processed_documents(processed_documents_file_path)
+            ),
+            tokenizer_name,
             chunk_size=token_split_chunk_size,
-            chunk_overlap=token_chunk_overlap
-        )
-
-        langchain_documents_text_chunked = text_splitter.split_documents(
-            langchain_documents_text + langchain_documents_tables
+            chunk_overlap=token_chunk_overlap,
+            num_workers=num_chunking_workers,
         )
 
         embedding_model = BedrockEmbeddings(
             model_id=embedding_model_id,
-            client=bedrock_runtime
+            client=embedding_bedrock_runtime
+        )
+        embedder = ConcurrentEmbedder(
+            embedding_model.embed_query,
+            max_concurrency=max_embedding_concurrency,
         )
 
         activate_vector_extension(db_connection)
@@ -209,7 +941,48 @@ if __name__ == "__main__":
             pre_delete_collection=pre_delete_collection
         )
 
-        pgvector_store.add_documents(langchain_documents_text_chunked)
+        if bulk_copy_embeddings:
+            vector_store_writer = PGVectorCopyWriter(db_engine, COLLECTION_NAME)
+        else:
+            vector_store_writer = pgvector_store
+
+        if build_ann_index_after_loading:
+            drop_ann_indexes(db_engine)
+
+        # Any change to these settings changes the ids of all the chunks.
+        chunking_settings = {
+            "splitter": "TokenTextSplitter",
+            "tokenizer": tokenizer_name,
+            "chunk_size": token_split_chunk_size,
+            "chunk_overlap": token_chunk_overlap,
+            "embedding_model_id": embedding_model_id,
+        }
+        ingestion_manifest = index_chunks_incrementally(
+            vector_store_writer,
+            embedder,
+            db_engine,
+            COLLECTION_NAME,
+            langchain_documents_text_chunked,
+            chunking_settings,
+            batch_size=embedding_batch_size,
+            max_queued_batches=max_queued_batches,
+            metadata_keys=filterable_metadata_keys,
+        )
+        record_ingestion_manifest(db_engine, COLLECTION_NAME, ingestion_manifest)
+        record_metadata_values(
+            db_engine, COLLECTION_NAME, ingestion_manifest["metadata_values"]
+        )
+
+        create_ann_index(
+            db_engine,
+            index_type=ann_index_type,
+            embedding_dimension=embedding_dimension,
+            hnsw_m=hnsw_m,
+            hnsw_ef_construction=hnsw_ef_construction,
+            ivfflat_lists=int(ivfflat_lists) if ivfflat_lists else None,
+        )
+        create_metadata_indexes(db_engine, filterable_metadata_keys)
+        create_lexical_index(db_engine)
 
         print("test indexing results")
         test_question = "Who were in the board of directors of Amazon in 2021 and what were their positions?"
@@ -5,10 +5,14 @@ from PIL import Image
 import streamlit as st
 from streamlit_chat import message
 import boto3
+import requests
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
 
 # Initialize Boto3 clients for Lambda and SSM
-lambda_client = boto3.client("lambda")
-ssm_client = boto3.client("ssm")
+boto3_session = boto3.Session()
+lambda_client = boto3_session.client("lambda")
+ssm_client = boto3_session.client("ssm")
 
 # Define chatbot name
 customer_chatbot_name = ":blue[Chatty] :sunglasses:"
@@ -32,6 +36,18 @@ def get_lambda_function_name():
 
 lambda_function_name = get_lambda_function_name()
 
+
+@st.cache_resource
+def get_streaming_function_url():
+    streaming_function_url_ssm_parameter = (
+        "/AgenticLLMAssistant/AgentExecutorStreamingURLParameter"
+    )
+
+    streaming_function_url = ssm_client.get_parameter(
+        Name=streaming_function_url_ssm_parameter
+    )
+    return streaming_function_url["Parameter"]["Value"]
+
 # initialise session variables
 if "generated" not in st.session_state:
     st.session_state["generated"] = []
@@ -78,12 +94,48 @@ def call_agent_lambda(user_input, session_id, agent_type, clean_history=False):
         print(e)
 
 
+def stream_agent_lambda(user_input, session_id, agent_type, clean_history=False):
+    """Yield the response chunks of the streaming function URL as they arrive."""
+    payload = json.dumps(
+        {
+            "user_input": user_input,
+            "session_id": session_id,
+            "chatbot_type": agent_type,
+            "clean_history": clean_history,
+        }
+    )
+    streaming_function_url = get_streaming_function_url()
+
+    # The function URL uses IAM auth, sign the request with SigV4.
+    signed_request = AWSRequest(
+        method="POST",
+        url=streaming_function_url,
+        data=payload,
+        headers={"Content-Type": "application/json"},
+    )
+    SigV4Auth(
+        boto3_session.get_credentials(), "lambda", boto3_session.region_name
+    ).add_auth(signed_request)
+
+    with requests.post(
+        streaming_function_url,
+        data=payload,
+        headers=dict(signed_request.headers),
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+            yield chunk
+
+
 clear_button = st.sidebar.button("Clear conversation", key="clear")
 
 agent_type = st.sidebar.radio(
     "Select a chat mode", ["basic", "agentic"], index=0  # pre-select "basic"
 )
 
+stream_response = st.sidebar.checkbox("Stream the response", value=True)
+
 if clear_button:
     st.session_state["generated"] = []
     st.session_state["past"] = []
@@ -110,10 +162,22 @@ with input_container:
         try:
             clean_history = st.session_state["clean_history"]
             print(clean_history)
-            output = call_agent_lambda(
-                user_input, session_id, agent_type, clean_history
-            )
-            output = output.get("response", default_response)
+            if stream_response:
+                # Show the response as it is generated, it is added to
+                # the conversation below once complete.
+                output = ""
+                response_placeholder = st.empty()
+                for chunk in stream_agent_lambda(
+                    user_input, session_id, agent_type, clean_history
+                ):
+                    output += chunk
+                    response_placeholder.markdown(output + "▌")
+                response_placeholder.empty()
+            else:
+                output = call_agent_lambda(
+                    user_input, session_id, agent_type, clean_history
+                )
+                output = output.get("response", default_response)
         except Exception as e:
             print(f"Error: {e}")
             output = default_response